@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import auth, protected, users, files, chats
+from app.api.api_v1.endpoints import auth, protected, users, files, chats, metrics
 
 api_router_v1 = APIRouter()
 
@@ -7,4 +7,5 @@ api_router_v1.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router_v1.include_router(protected.router, prefix="/protected", tags=["protected"])
 api_router_v1.include_router(users.router, prefix="/users", tags=["users"])
 api_router_v1.include_router(files.router, prefix="/files", tags=["files"])
-api_router_v1.include_router(chats.router, prefix="/chats", tags=["chats"])
\ No newline at end of file
+api_router_v1.include_router(chats.router, prefix="/chats", tags=["chats"])
+api_router_v1.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
\ No newline at end of file
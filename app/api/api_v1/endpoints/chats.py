@@ -1,7 +1,11 @@
-from typing import List
+from typing import Dict, List, Optional
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload, contains_eager, subqueryload
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
@@ -10,9 +14,15 @@ from app.schemas.chats import Chat, ChatCreate, ChatUpdate, ChatWithMessages, Ch
 from app.db.models.chats import Chat as ChatModel
 from app.db.models.messages import Message as MessageModel
 from app.schemas.messages import Message, MessageCreate
-from app.helpers.openai_functions import create_chat_completion, create_chat_completion_context
-from app.helpers.qdrant_functions import search_in_qdrant
-from app.helpers.chat_helpers.standardize_prompt import standardize_prompt_for_RAG
+from app.db.session import AsyncSessionLocal
+from app.helpers.openai_functions import create_chat_completion_async, create_chat_completion_stream_async
+from app.helpers.chat_helpers.retrieval import retrieve_knowledge
+from app.helpers.chat_helpers.context_assembly import assemble_knowledge_context
+from app.helpers.chat_helpers.knowledge import to_knowledge_references, to_knowledge_entries, resolve_knowledge_references
+from app.helpers.chat_helpers.streaming import format_sse_event
+from app.helpers.chat_helpers.conversation_memory import load_memory_messages, build_conversation_memory, fold_conversation_memory
+from app.helpers.embedding_cache import get_query_embedding_async
+from app.helpers.answer_cache import get_answer_cache_generation, lookup_cached_answer, store_cached_answer
 
 from app.core.config import settings
 
@@ -21,11 +31,111 @@ router = APIRouter()
 
 COLLECTION_NAME = settings.COLLECTION_NAME_RISK_MANAGEMENT
 
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _to_message(db_message, knowledge=None) -> Message:
+    return Message(
+        id=db_message.id,
+        chat_id=db_message.chat_id,
+        sender=db_message.sender,
+        content=db_message.content,
+        knowledge=knowledge,
+        created_at=db_message.created_at,
+        updated_at=db_message.updated_at
+    )
+
+
+#################################################################################################
+#   Answer flow shared by the chat endpoints
+#   Yields ("knowledge", (knowledge entries, knowledge references)) once, then ("token", text) for
+#   every piece of the answer (the whole answer at once unless stream). With use_answer_cache the
+#   question is looked up in the semantic answer cache first (a hit is answered from it), and a
+#   generated answer is stored under the cache generation read before retrieval.
+#################################################################################################
+async def _answer_query(conversation: str, search_query: str, use_answer_cache: bool = False, rewrite_history: str = None, stream: bool = True):
+    if use_answer_cache:
+        query_embedding = await get_query_embedding_async(search_query)
+        cache_generation = await get_answer_cache_generation(COLLECTION_NAME)
+        cached_answer = await lookup_cached_answer(COLLECTION_NAME, query_embedding, cache_generation)
+        if cached_answer:
+            knowledge_references = cached_answer["knowledge"]
+            knowledge_entries = (await resolve_knowledge_references(COLLECTION_NAME, [knowledge_references]))[0]
+            yield "knowledge", (knowledge_entries, knowledge_references)
+            yield "token", cached_answer["answer"]
+            return
+
+    search_results = await retrieve_knowledge(COLLECTION_NAME, search_query, rewrite_history, settings.RETRIEVAL_CANDIDATES)
+
+    combined_result, selected_results = assemble_knowledge_context(search_results)
+    knowledge_references = to_knowledge_references(selected_results)
+    yield "knowledge", (to_knowledge_entries(selected_results), knowledge_references)
+
+    answer_parts = []
+    if stream:
+        async for delta in create_chat_completion_stream_async(conversation, combined_result):
+            answer_parts.append(delta)
+            yield "token", delta
+    else:
+        answer_parts.append(await create_chat_completion_async(conversation, combined_result))
+        yield "token", answer_parts[0]
+
+    if use_answer_cache:
+        await store_cached_answer(COLLECTION_NAME, search_query, query_embedding, "".join(answer_parts), knowledge_references, cache_generation)
+
+
+#################################################################################################
+#   Streams one assistant answer as server-sent events:
+#   knowledge (retrieved chunks) -> token (answer deltas) -> done (saved ChatResponse) | error
+#   The assistant MessageModel row is written only after the last token was produced.
+#################################################################################################
+async def _stream_assistant_answer(chat: Chat, query: Message, conversation: str, search_query: str, use_answer_cache: bool = False, rewrite_history: str = None):
+    try:
+        answer_parts = []
+        async for kind, data in _answer_query(conversation, search_query, use_answer_cache, rewrite_history):
+            if kind == "knowledge":
+                knowledge_entries, knowledge_references = data
+                yield format_sse_event("knowledge", knowledge_entries)
+            else:
+                answer_parts.append(data)
+                yield format_sse_event("token", {"content": data})
+
+        # The request scoped session is already closed once streaming starts
+        async with AsyncSessionLocal() as db:
+            try:
+                db_message_assistant = MessageModel(
+                    chat_id = chat.id,
+                    sender = "assistant",
+                    content = "".join(answer_parts),
+                    knowledge = knowledge_references
+                )
+                db.add(db_message_assistant)
+                await db.commit()
+                await db.refresh(db_message_assistant)
+            except Exception:
+                await db.rollback()
+                raise
+
+        response = ChatResponse(
+            **chat.model_dump(),
+            query=query,
+            response=_to_message(db_message_assistant, knowledge_entries)
+        )
+
+        yield format_sse_event("done", response.model_dump(mode="json"))
+
+    except HTTPException as http_exc:
+        yield format_sse_event("error", {"detail": http_exc.detail})
+    except SQLAlchemyError as e:
+        yield format_sse_event("error", {"detail": "Database error: " + str(e)})
+    except Exception as e:
+        yield format_sse_event("error", {"detail": "Unexpected error: " + str(e)})
+
 #################################################################################################
 #   CREATE CHAT
 #################################################################################################
 @router.post("/", response_model = ChatResponse)
-async def create_chat(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate):
+async def create_chat(*, db: AsyncSession = Depends(deps.get_async_db), chat_in: ChatCreate):
     
     try:
         db_chat = ChatModel(
@@ -33,8 +143,8 @@ async def create_chat(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate
             first_message = chat_in.first_message
         )
         db.add(db_chat)
-        db.commit()
-        db.refresh(db_chat)
+        await db.commit()
+        await db.refresh(db_chat)
         
         db_message_user = MessageModel(
             chat_id = db_chat.id,
@@ -43,47 +153,30 @@ async def create_chat(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate
         )
         
         db.add(db_message_user)
-        db.commit()
-        db.refresh(db_message_user)
+        await db.commit()
+        await db.refresh(db_message_user)
         
         queryText = db_chat.first_message
         
-        search_results = search_in_qdrant(COLLECTION_NAME, queryText, 10)
-        
-        combined_result = ""
-        result_list = []
-        for result in search_results:
-            # print(result.payload)
-            combined_result += f"{result.payload}"
-            result_list.append(result.payload)
-        
-        # db_full_chat = (
-        #     db.query(ChatModel)
-        #     .options(joinedload(ChatModel.messages))
-        #     .filter(ChatModel.id == db_chat.id)
-        #     .first()
-        # )
-        # if not db_full_chat:
-        #     raise HTTPException(status_code=404, detail="Chat not found")
-        
-        # print(db_full_chat)
-        
-        # # Sort messages by created_at
-        # db_full_chat.messages.sort(key=lambda message: message.created_at)
-        
-        openai_response = create_chat_completion(queryText, combined_result)
-        # openai_response = create_chat_completion_context(queryText, db_full_chat.messages, combined_result)
+        # Near-duplicate first messages are answered straight from the semantic cache
+        answer_parts = []
+        async for kind, data in _answer_query(queryText, queryText, use_answer_cache=True, stream=False):
+            if kind == "knowledge":
+                knowledge_entries, knowledge_references = data
+            else:
+                answer_parts.append(data)
+        openai_response = "".join(answer_parts)
         
         db_message_assistant = MessageModel(
             chat_id = db_chat.id,
             sender = "assistant",
             content = openai_response,
-            knowledge = result_list
+            knowledge = knowledge_references
         )
         
         db.add(db_message_assistant)
-        db.commit()
-        db.refresh(db_message_assistant)
+        await db.commit()
+        await db.refresh(db_message_assistant)
         print(db_message_user.content)
         response = ChatResponse(
             id = db_chat.id,
@@ -105,7 +198,7 @@ async def create_chat(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate
                 chat_id=db_message_assistant.chat_id,
                 sender=db_message_assistant.sender,
                 content=db_message_assistant.content,
-                knowledge=db_message_assistant.knowledge,
+                knowledge=knowledge_entries,
                 created_at=db_message_assistant.created_at,
                 updated_at=db_message_assistant.updated_at
             )
@@ -115,19 +208,19 @@ async def create_chat(*, db: Session = Depends(deps.get_db), chat_in: ChatCreate
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 #################################################################################################
 #   UPDATE CHAT 
 #################################################################################################
 @router.put("/{chat_id}", response_model = ChatResponse)
-async def update_chat(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID, message_in: MessageCreate):
+async def update_chat(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, message_in: MessageCreate, background_tasks: BackgroundTasks):
     try:
-        db_chat = db.query(ChatModel).filter(ChatModel.id == chat_id).first()
+        db_chat = await db.get(ChatModel, chat_id)
         if not db_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
@@ -140,44 +233,22 @@ async def update_chat(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID,
         )
         
         db.add(db_message_user)
-        db.commit()
-        db.refresh(db_message_user)
-
-        
-        db_full_chat = (
-            db.query(ChatModel)
-            .options(joinedload(ChatModel.messages))
-            .filter(ChatModel.id == db_chat.id)
-            .first()
-        )
-        if not db_full_chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
-        
-        
-        
-        # Sort messages by created_at
-        db_full_chat.messages.sort(key=lambda message: message.created_at)
-        print(db_full_chat)
+        await db.commit()
+        await db.refresh(db_message_user)
 
-        chat_history = f"Conversation:\n\n"
-        for currMessage in db_full_chat.messages:
-            sender = "assistant" if currMessage.sender == "assistant" else "human"
-            chat_history += f"{sender}: {currMessage.content}\n\n"
+        # Rolling summary + recent messages instead of the whole chat
+        memory_messages = await load_memory_messages(db, db_chat)
+        chat_history = build_conversation_memory(db_chat.summary, memory_messages)
 
         print(chat_history)
-        standardize_prompt_from_openai = standardize_prompt_for_RAG(chat_history)
-
-        print(standardize_prompt_from_openai)
-        search_results = search_in_qdrant(COLLECTION_NAME, standardize_prompt_from_openai, 10)
+        search_results = await retrieve_knowledge(COLLECTION_NAME, queryText, chat_history, settings.RETRIEVAL_CANDIDATES)
         
-        combined_result = ""
-        result_list = []
-        for result in search_results:
-            combined_result += f"{result.payload}"
-            result_list.append(result.payload)
+        combined_result, selected_results = assemble_knowledge_context(search_results)
+        knowledge_references = to_knowledge_references(selected_results)
+        knowledge_entries = to_knowledge_entries(selected_results)
 
         
-        openai_response = create_chat_completion(chat_history, combined_result)
+        openai_response = await create_chat_completion_async(chat_history, combined_result)
         # openai_response = create_chat_completion_context(queryText, db_full_chat.messages, combined_result)
         
         # MUST comment out these 
@@ -189,12 +260,12 @@ async def update_chat(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID,
             chat_id = db_chat.id,
             sender = "assistant",
             content = openai_response,
-            knowledge = result_list
+            knowledge = knowledge_references
         )
         
         db.add(db_message_assistant)
-        db.commit()
-        db.refresh(db_message_assistant)
+        await db.commit()
+        await db.refresh(db_message_assistant)
         print(db_message_user.content)
         
         response = ChatResponse(
@@ -217,12 +288,15 @@ async def update_chat(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID,
                 chat_id=db_message_assistant.chat_id,
                 sender=db_message_assistant.sender,
                 content=db_message_assistant.content,
-                knowledge=db_message_assistant.knowledge,
+                knowledge=knowledge_entries,
                 created_at=db_message_assistant.created_at,
                 updated_at=db_message_assistant.updated_at
             )
         )
         
+        # Fold old messages into the summary after the answer was sent
+        background_tasks.add_task(fold_conversation_memory, db_chat.id)
+        
         return response
     
     except HTTPException as http_exc:
@@ -230,33 +304,120 @@ async def update_chat(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID,
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+    
+#################################################################################################
+#   CREATE CHAT (STREAMING)
+#   Same as CREATE CHAT, but answers with text/event-stream so the first tokens reach the
+#   client while the model is still generating.
+#################################################################################################
+@router.post("/stream")
+async def create_chat_stream(*, db: AsyncSession = Depends(deps.get_async_db), chat_in: ChatCreate):
+    
+    try:
+        db_chat = ChatModel(
+            user_id = chat_in.user_id,
+            first_message = chat_in.first_message
+        )
+        db.add(db_chat)
+        await db.commit()
+        await db.refresh(db_chat)
+        
+        db_message_user = MessageModel(
+            chat_id = db_chat.id,
+            sender = "user",
+            content = db_chat.first_message
+        )
+        
+        db.add(db_message_user)
+        await db.commit()
+        await db.refresh(db_message_user)
+        
+        chat = Chat.model_validate(db_chat, from_attributes=True)
+        queryText = db_chat.first_message
+        
+        return StreamingResponse(
+            _stream_assistant_answer(chat, _to_message(db_message_user), queryText, queryText, use_answer_cache=True),
+            media_type="text/event-stream",
+            headers=STREAM_HEADERS
+        )
+    except ValidationError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
+#################################################################################################
+#   UPDATE CHAT (STREAMING)
+#################################################################################################
+@router.put("/{chat_id}/stream")
+async def update_chat_stream(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, message_in: MessageCreate):
+    try:
+        db_chat = await db.get(ChatModel, chat_id)
+        if not db_chat:
+            raise HTTPException(status_code=404, detail="Chat not found")
+
+        db_message_user = MessageModel(
+            chat_id = db_chat.id,
+            sender = "user",
+            content = message_in.content
+        )
+        
+        db.add(db_message_user)
+        await db.commit()
+        await db.refresh(db_message_user)
+
+        memory_messages = await load_memory_messages(db, db_chat)
+        chat_history = build_conversation_memory(db_chat.summary, memory_messages)
+        
+        chat = Chat.model_validate(db_chat, from_attributes=True)
+
+        return StreamingResponse(
+            _stream_assistant_answer(chat, _to_message(db_message_user), chat_history, message_in.content, rewrite_history=chat_history),
+            media_type="text/event-stream",
+            headers=STREAM_HEADERS,
+            background=BackgroundTask(fold_conversation_memory, chat.id)
+        )
+    
+    except HTTPException as http_exc:
+        raise http_exc
+    except ValidationError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except Exception as e:
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
 #################################################################################################
 #   DELETE CHAT BY ID
 #################################################################################################
 @router.delete("/{chat_id}", response_model=dict)
-async def delete_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID):
+async def delete_chat_by_id(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID):
     try:
-        db_chat = db.query(ChatModel).filter(ChatModel.id == chat_id).first()
+        db_chat = await db.get(ChatModel, chat_id)
         if not db_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
-        db.delete(db_chat)
-        db.commit()
+        await db.delete(db_chat)
+        await db.commit()
         
         return {"detail": "Chat deleted successfully"}
     except HTTPException as http_exc:
         raise http_exc
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
     
@@ -264,9 +425,9 @@ async def delete_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid
 #   GET ALL CHAT PREVIEWS FOR A USER BY USER ID
 #################################################################################################
 @router.get("/users/{user_id}", response_model=List[Chat])
-async def get_chats_for_user(*, db: Session = Depends(deps.get_db), user_id: uuid.UUID):
+async def get_chats_for_user(*, db: AsyncSession = Depends(deps.get_async_db), user_id: uuid.UUID):
     try:
-        db_chats = db.query(ChatModel).filter(ChatModel.user_id == user_id).order_by(ChatModel.created_at.desc()).all()
+        db_chats = (await db.scalars(select(ChatModel).where(ChatModel.user_id == user_id).order_by(ChatModel.created_at.desc()))).all()
         return db_chats
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
@@ -277,9 +438,9 @@ async def get_chats_for_user(*, db: Session = Depends(deps.get_db), user_id: uui
 #   GET ALL CHAT PREVIEWS
 #################################################################################################
 @router.get("/", response_model=List[Chat])
-async def get_chats_for_user(*, db: Session = Depends(deps.get_db)):
+async def get_chats_for_user(*, db: AsyncSession = Depends(deps.get_async_db)):
     try:
-        db_chats = db.query(ChatModel).order_by(ChatModel.created_at.desc()).all()
+        db_chats = (await db.scalars(select(ChatModel).order_by(ChatModel.created_at.desc()))).all()
         return db_chats
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
@@ -290,9 +451,9 @@ async def get_chats_for_user(*, db: Session = Depends(deps.get_db)):
 #   UPDATE CHAT BY ID
 #################################################################################################
 @router.put("/{chat_id}", response_model=Chat)
-async def update_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID, chat_in: ChatUpdate):
+async def update_chat_by_id(*, db: AsyncSession = Depends(deps.get_async_db), chat_id: uuid.UUID, chat_in: ChatUpdate):
     try:
-        db_chat = db.query(ChatModel).filter(ChatModel.id == chat_id).first()
+        db_chat = await db.get(ChatModel, chat_id)
         if not db_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
@@ -300,18 +461,18 @@ async def update_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid
         for key, value in update_data.items():
             setattr(db_chat, key, value)
 
-        db.commit()
-        db.refresh(db_chat)
+        await db.commit()
+        await db.refresh(db_chat)
         return db_chat
     except HTTPException as http_exc:
         raise http_exc
     except ValidationError as ve:
         raise HTTPException(status_code=422, detail=str(ve))
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
     
@@ -319,13 +480,21 @@ async def update_chat_by_id(*, db: Session = Depends(deps.get_db), chat_id: uuid
 #   GET ALL MESSAGES FOR A CHAT USING CHAT_ID
 #################################################################################################
 @router.get("/{chat_id}", response_model=ChatWithMessages)
-async def get_chat_with_messages(*, db: Session = Depends(deps.get_db), chat_id: uuid.UUID):
+async def get_chat_with_messages(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    chat_id: uuid.UUID,
+    include_knowledge: bool = Query(False, description="Resolve and return the knowledge of each message")
+):
     try:
-        db_chat = (
-            db.query(ChatModel)
-            .options(joinedload(ChatModel.messages))
-            .filter(ChatModel.id == chat_id)
-            .first()
+        message_loader = selectinload(ChatModel.messages)
+        if not include_knowledge:
+            message_loader = message_loader.defer(MessageModel.knowledge)
+
+        db_chat = await db.scalar(
+            select(ChatModel)
+            .options(message_loader)
+            .where(ChatModel.id == chat_id)
         )
         if not db_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
@@ -333,8 +502,48 @@ async def get_chat_with_messages(*, db: Session = Depends(deps.get_db), chat_id:
         # Sort messages by created_at
         db_chat.messages.sort(key=lambda message: message.created_at)
         
-        return db_chat
+        knowledge_lists = [None] * len(db_chat.messages)
+        if include_knowledge:
+            knowledge_lists = await resolve_knowledge_references(
+                COLLECTION_NAME, [message.knowledge for message in db_chat.messages]
+            )
+        
+        return ChatWithMessages(
+            **Chat.model_validate(db_chat, from_attributes=True).model_dump(),
+            messages=[
+                _to_message(message, knowledge)
+                for message, knowledge in zip(db_chat.messages, knowledge_lists)
+            ]
+        )
+    except HTTPException as http_exc:
+        raise http_exc
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
+#################################################################################################
+#   RESOLVE THE KNOWLEDGE OF MESSAGES IN A CHAT (on demand, one qdrant call per request)
+#################################################################################################
+@router.get("/{chat_id}/knowledge", response_model=Dict[uuid.UUID, Optional[List[Dict]]])
+async def get_chat_knowledge(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    chat_id: uuid.UUID,
+    message_ids: Optional[List[uuid.UUID]] = Query(None, description="Messages to resolve, all messages if omitted")
+):
+    try:
+        statement = select(MessageModel.id, MessageModel.knowledge).where(
+            MessageModel.chat_id == chat_id,
+            MessageModel.knowledge.is_not(None)
+        )
+        if message_ids:
+            statement = statement.where(MessageModel.id.in_(message_ids))
+        rows = (await db.execute(statement)).all()
+        
+        knowledge_lists = await resolve_knowledge_references(COLLECTION_NAME, [row.knowledge for row in rows])
+        return {row.id: knowledge for row, knowledge in zip(rows, knowledge_lists)}
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
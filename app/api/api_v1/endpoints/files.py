@@ -1,6 +1,11 @@
-from typing import List
+from typing import List, Optional
+import hashlib
+import json
+import os
+import tempfile
 import uuid
-from fastapi import BackgroundTasks, APIRouter, Depends, HTTPException,Query,UploadFile, File as FastAPIFile
+from fastapi import APIRouter, Depends, HTTPException,Query,UploadFile, File as FastAPIFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
@@ -10,11 +15,18 @@ from app.db.models.files import File as FileModel
 from app.db.models.users import User as UserModel
 from app.schemas.files import File, FileUpdate
 from app.helpers.supabase_bucket_insert import upload_file_to_supabase, delete_file_from_supabase
-from app.helpers.qdrant_functions import delete_points_by_uuid
+from app.helpers.qdrant_functions import delete_points_by_uuid, build_inventory_filter, iterate_points_async
+from app.helpers.answer_cache import invalidate_answer_cache
+from app.helpers.chat_helpers.streaming import format_sse_event
 
-from app.background.unstructured_parse import process_pdf
+from app.background.job_queue import enqueue_job, has_active_job
+from app.db.models.ingestion_checkpoints import IngestionCheckpoint
+from app.background.progress import read_file_progress, watch_file_progress, is_final_progress
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 #################################################################################################
 #   GET All Files with Pagination
 #################################################################################################
@@ -31,6 +43,37 @@ async def get_all_files(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
+#################################################################################################
+#   GET the vector-point inventory of the knowledge collection (newline-delimited JSON)
+#   One line per point: {"id", "file_id", "file_name", "page_no"}; filters are optional and
+#   served by the payload indexes. Pages are streamed as qdrant returns them.
+#################################################################################################
+@router.get("/points")
+async def get_points_inventory(
+    *,
+    file_id: Optional[uuid.UUID] = Query(None, description="Only points of this file"),
+    file_name: Optional[str] = Query(None, description="Only points of files with this name"),
+    page_no: Optional[int] = Query(None, description="Only points of this page"),
+    page_size: int = Query(1000, ge=1, le=10000, description="Points fetched per scroll request")
+):
+    scroll_filter = build_inventory_filter(
+        file_id=str(file_id) if file_id else None,
+        file_name=file_name,
+        page_no=str(page_no) if page_no is not None else None,
+    )
+
+    async def stream_inventory():
+        try:
+            async for points in iterate_points_async(
+                str(settings.COLLECTION_NAME_RISK_MANAGEMENT), scroll_filter, page_size
+            ):
+                yield "".join(json.dumps(point, default=str) + "\n" for point in points)
+        except Exception as e:
+            print(f"Points inventory failed: {e}")
+            yield json.dumps({"error": "Error occurred while reading from vectorDB"}) + "\n"
+
+    return StreamingResponse(stream_inventory(), media_type="application/x-ndjson")
+
 #################################################################################################
 #   GET File BY ID
 #################################################################################################
@@ -48,6 +91,46 @@ async def get_file_by_id(file_id: uuid.UUID, db: Session = Depends(deps.get_db))
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
 
 
+#################################################################################################
+#   Follow the ingestion of a file (server-sent events)
+#   "progress" {"status", "pages_done", "pages_total"} whenever the status changes,
+#   "done" {"status", "parse_stats"} once the file is Completed, or Failed with no retry left.
+#   All clients of a file share one reader of its row (watch_file_progress, one read per
+#   INGEST_PROGRESS_INTERVAL_SECONDS); a comment line every INGEST_PROGRESS_HEARTBEAT_SECONDS
+#   keeps idle proxies from closing.
+#################################################################################################
+@router.get("/{file_id}/progress")
+async def stream_file_progress(file_id: uuid.UUID):
+    try:
+        progress = await read_file_progress(file_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+    if progress is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    async def stream_progress():
+        last_status = None
+        try:
+            async for progress in watch_file_progress(file_id, settings.INGEST_PROGRESS_HEARTBEAT_SECONDS):
+                if progress is None:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if progress["status"] != last_status:
+                    last_status = progress["status"]
+                    yield format_sse_event("progress", {key: progress[key] for key in ("status", "pages_done", "pages_total")})
+
+                if is_final_progress(progress):
+                    yield format_sse_event("done", {"status": progress["status"], "parse_stats": progress["parse_stats"]})
+                    return
+        except LookupError:
+            yield format_sse_event("error", {"detail": "File not found"})
+        except Exception as e:
+            yield format_sse_event("error", {"detail": "Unexpected error: " + str(e)})
+
+    return StreamingResponse(stream_progress(), media_type="text/event-stream", headers=STREAM_HEADERS)
+
+
 #################################################################################################
 #   Upload a File
 #################################################################################################
@@ -58,7 +141,7 @@ async def upload_file(
     uploader_id: uuid.UUID,
     filename: str,
     file: UploadFile = FastAPIFile(...),
-    background_tasks: BackgroundTasks
+    priority: int = Query(0, description="Ingestion priority, higher is parsed first")
 ):
     # Validate file extension
     if file.content_type != "application/pdf":
@@ -68,32 +151,51 @@ async def upload_file(
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    spool_path = None
     try:
-        file_bytes = await file.read()
+        # Spool the upload to disk in chunks, large PDFs are never held in memory as a whole
+        fd, spool_path = tempfile.mkstemp(prefix="upload_", suffix=".pdf")
+        content_hash = hashlib.sha256()
+        with os.fdopen(fd, "wb") as spool_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                spool_file.write(chunk)
+                content_hash.update(chunk)
 
-        public_url = upload_file_to_supabase(file_bytes, filename, str(uploader_id))
+        public_url = upload_file_to_supabase(spool_path, filename, str(uploader_id))
 
         # Add to the database
         db_file = FileModel(
             uploader_id=uploader_id,
             file_name=filename,
             file_url=public_url,
-            status="parsing..."
+            status="queued",
+            content_hash=content_hash.hexdigest()
         )
         db.add(db_file)
+        db.flush()
+
+        # Parsing runs in the worker pool (python -m app.background.worker), not in the API process
+        enqueue_job(
+            db,
+            db_file.file_id,
+            {"file_url": str(public_url), "file_name": filename, "content_hash": db_file.content_hash},
+            priority=priority
+        )
         db.commit()
         db.refresh(db_file)
 
-        background_tasks.add_task(process_pdf, file_bytes, str(db_file.file_id), str(public_url), filename)
-
         return db_file
 
     except ValidationError as e:
         raise HTTPException(status_code=422, detail="Invalid input: " + str(e))
     except SQLAlchemyError as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail="Database error: " + str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
     
 
 #################################################################################################
@@ -130,6 +232,47 @@ async def update_file(
         db.rollback()
         raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
     
+#################################################################################################
+#   Retry the ingestion of a file that failed
+#   Pages checkpointed by the failed attempt are kept and skipped, parsing resumes with the rest.
+#################################################################################################
+@router.post("/{file_id}/retry", response_model=File)
+async def retry_file(
+    *,
+    db: Session = Depends(deps.get_db),
+    file_id: uuid.UUID,
+    priority: int = Query(0, description="Ingestion priority, higher is parsed first")
+):
+    try:
+        db_file = db.query(FileModel).filter(FileModel.file_id == file_id).first()
+        if not db_file:
+            raise HTTPException(status_code=404, detail="File not found")
+        if db_file.status == "Completed":
+            raise HTTPException(status_code=409, detail="File is already ingested")
+        if has_active_job(db, file_id):
+            raise HTTPException(status_code=409, detail="File is already queued or being parsed")
+
+        done_pages = db.query(IngestionCheckpoint).filter(IngestionCheckpoint.file_id == file_id).count()
+        enqueue_job(
+            db,
+            file_id,
+            {"file_url": db_file.file_url, "file_name": db_file.file_name, "content_hash": db_file.content_hash},
+            priority=priority
+        )
+        db_file.status = f"queued (resuming after {done_pages} pages)" if done_pages else "queued"
+        db.commit()
+        db.refresh(db_file)
+
+        return db_file
+    except HTTPException as http_exc:
+        raise http_exc
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Database error: " + str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
 #################################################################################################
 #   DELETE a file and all its vector points
 #################################################################################################
@@ -154,6 +297,7 @@ async def delete_file_by_id(*, db: Session = Depends(deps.get_db), file_id: uuid
             success = delete_points_by_uuid(str(settings.COLLECTION_NAME_RISK_MANAGEMENT), str(file_id))
             
             if success:
+                invalidate_answer_cache(str(settings.COLLECTION_NAME_RISK_MANAGEMENT))
                 return {"detail": f"File with ID {file_id} deleted from DB & vectorDB successfully"}
             else:
                 raise HTTPException(status_code=500, detail="Failed to delete File from vectorDB")
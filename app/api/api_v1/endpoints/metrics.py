@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+
+from app.helpers.embedding_cache import embedding_cache_stats
+from app.background.job_queue import job_queue_stats
+from app.core.llm_governor import llmGovernor
+
+router = APIRouter()
+
+#################################################################################################
+#   EMBEDDING CACHE COUNTERS (per worker process)
+#################################################################################################
+@router.get("/embedding-cache", response_model=dict)
+async def get_embedding_cache_stats():
+    try:
+        return embedding_cache_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
+
+#################################################################################################
+#   INGESTION JOB QUEUE (jobs per status)
+#################################################################################################
+@router.get("/ingestion-queue", response_model=dict)
+async def get_ingestion_queue_stats():
+    try:
+        return await job_queue_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
+
+
+#################################################################################################
+#   OPENAI RATE GOVERNOR (per API process: admission wait per lane, budgets per model)
+#################################################################################################
+@router.get("/llm-governor", response_model=dict)
+async def get_llm_governor_stats():
+    try:
+        return llmGovernor.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Unexpected error: " + str(e))
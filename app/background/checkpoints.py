@@ -0,0 +1,60 @@
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.models.ingestion_checkpoints import IngestionCheckpoint
+from app.db.session import SessionLocal
+
+#################################################################################################
+#   Per-page ingestion checkpoints
+#   Every page that is fully uploaded to qdrant gets a row with its point ids. A failed or
+#   interrupted ingestion keeps its points and its rows; the next attempt (job retry, expired
+#   lease or POST /files/{id}/retry) skips the checkpointed pages entirely, they are neither
+#   partitioned nor sent to the LLM again. The rows are removed when the file completes.
+#################################################################################################
+
+#################################################################################################
+#   Helper function to load the checkpoints of a file
+#   input: file id, output: {page_no: {"page_hash", "point_ids", "strategy", "cleaning"}}
+#################################################################################################
+def load_checkpoints(file_id: str) -> dict:
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(IngestionCheckpoint).where(IngestionCheckpoint.file_id == file_id)
+        ).scalars().all()
+        return {
+            row.page_no: {
+                "page_hash": row.page_hash,
+                "point_ids": list(row.point_ids or []),
+                "strategy": row.strategy,
+                "cleaning": row.cleaning,
+            }
+            for row in rows
+        }
+
+
+#################################################################################################
+#   Helper function to record a finished page (a page finished again overwrites its row)
+#################################################################################################
+def save_checkpoint(file_id: str, page_no: int, page_hash: str, point_ids, strategy: str = None, cleaning: dict = None):
+    values = {
+        "file_id": file_id,
+        "page_no": page_no,
+        "page_hash": page_hash,
+        "point_ids": list(point_ids),
+        "strategy": strategy,
+        "cleaning": cleaning,
+    }
+    statement = insert(IngestionCheckpoint).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[IngestionCheckpoint.file_id, IngestionCheckpoint.page_no],
+        set_={key: statement.excluded[key] for key in ("page_hash", "point_ids", "strategy", "cleaning", "completed_at")},
+    )
+    with SessionLocal() as db:
+        db.execute(statement)
+        db.commit()
+
+
+def clear_checkpoints(file_id: str):
+    with SessionLocal() as db:
+        db.execute(delete(IngestionCheckpoint).where(IngestionCheckpoint.file_id == file_id))
+        db.commit()
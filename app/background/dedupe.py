@@ -0,0 +1,99 @@
+import hashlib
+
+from qdrant_client import models
+
+from app.core.config import settings
+from app.db.models.files import File as FileModel
+from app.db.session import SessionLocal
+from app.helpers.qdrant_functions import scroll_points_with_vectors, copy_points, copy_file_points, find_first_point
+
+#################################################################################################
+#   Content-hash deduplication of ingestion
+#   file level: fileinfo.content_hash (sha256 of the uploaded bytes). A file identical to an
+#               already ingested one gets a copy of its points, nothing is parsed.
+#   page level: payload page_hash (sha256 of the partitioned page: text + image bytes). A page
+#               seen before in any file (the unchanged pages of a new revision of a circular,
+#               the finished pages of a retried job) gets a copy of its points instead of being
+#               cleaned, chunked, summarized and embedded again.
+#   The page hash is taken before the LLM cleaning step, so unchanged pages skip that call too
+#   (the cleaned text is not deterministic and would rarely hash the same).
+#################################################################################################
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_content_hash(pdf_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(pdf_path, "rb") as pdf_file:
+        while chunk := pdf_file.read(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def page_content_hash(parts) -> str:
+    sha256 = hashlib.sha256()
+    for part in parts:
+        if part["type"] == "image":
+            sha256.update(b"\x00image\x00" + (part["image_base64"] or "").encode("utf-8"))
+        else:
+            sha256.update(b"\x00text\x00" + part["text"].encode("utf-8"))
+    return sha256.hexdigest()
+
+
+#################################################################################################
+#   Helper function to find a completed file with the same content
+#   input: content hash, id of the file being ingested, output: file id or None
+#################################################################################################
+def find_ingested_duplicate(content_hash: str, file_id: str):
+    with SessionLocal() as db:
+        return (
+            db.query(FileModel.file_id)
+            .filter(
+                FileModel.content_hash == content_hash,
+                FileModel.file_id != file_id,
+                FileModel.status == "Completed",
+            )
+            .order_by(FileModel.uploaded_at.desc())
+            .limit(1)
+            .scalar()
+        )
+
+
+#################################################################################################
+#   Helper function to give a file the points of an identical, already ingested file
+#   Copied in batches (see copy_file_points); between_batches may raise to stop the copy.
+#   output: number of points copied
+#################################################################################################
+def reuse_file_points(source_file_id: str, file_id: str, file_url: str, file_name: str, between_batches=None) -> int:
+    collection_name = str(settings.COLLECTION_NAME_RISK_MANAGEMENT)
+    return copy_file_points(collection_name, str(source_file_id), file_id, file_url, file_name, between_batches)
+
+
+#################################################################################################
+#   Helper function to give a page the points of an identical page ingested before
+#   Points of one source file and page only are fetched (the same page may exist in many files);
+#   a first lookup without vectors picks that file and page.
+#   output: ids of the copied points, None when the page was never ingested before
+#################################################################################################
+def reuse_page_points(page_hash: str, file_id: str, file_url: str, file_name: str, page_no: str):
+    collection_name = str(settings.COLLECTION_NAME_RISK_MANAGEMENT)
+    same_page = models.FieldCondition(key="page_hash", match=models.MatchValue(value=page_hash))
+
+    # prefer this file's own points (retried job), otherwise any file that has the page
+    source = find_first_point(
+        collection_name,
+        models.Filter(must=[same_page, models.FieldCondition(key="file_id", match=models.MatchValue(value=file_id))]),
+    ) or find_first_point(collection_name, models.Filter(must=[same_page]))
+    if source is None:
+        return None
+
+    records = scroll_points_with_vectors(
+        collection_name,
+        models.Filter(must=[
+            same_page,
+            models.FieldCondition(key="file_id", match=models.MatchValue(value=source["file_id"])),
+            models.FieldCondition(key="page_no", match=models.MatchValue(value=source["page_no"])),
+        ]),
+    )
+    if not records:
+        return None
+    return copy_points(collection_name, records, file_id, file_url, file_name, page_no)
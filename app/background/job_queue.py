@@ -0,0 +1,176 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update, func, case
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.files import File as FileModel
+from app.db.models.ingestion_jobs import IngestionJob
+from app.db.session import SessionLocal, AsyncSessionLocal
+
+#################################################################################################
+#   Postgres backed ingestion job queue
+#   The API only inserts rows; workers claim them with SELECT ... FOR UPDATE SKIP LOCKED, so any
+#   number of worker processes (on any machine) can poll the same table without double claims.
+#   A claimed job holds a lease (locked_until). The worker renews it while the job runs; if the
+#   worker dies the lease expires and the job is queued again, up to max_attempts times.
+#################################################################################################
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+# raised inside a job that must stop: its lease was lost or its file was deleted
+class IngestionAborted(Exception):
+    pass
+
+
+def file_exists(file_id) -> bool:
+    with SessionLocal() as db:
+        return db.execute(select(FileModel.file_id).where(FileModel.file_id == file_id)).first() is not None
+
+
+#################################################################################################
+#   Helper function to enqueue a job in the caller's transaction
+#   input: session, file id, job payload, priority, output: IngestionJob (not committed)
+#################################################################################################
+def enqueue_job(db: Session, file_id, payload: dict, priority: int = 0, kind: str = "process_pdf"):
+    job = IngestionJob(
+        file_id=file_id,
+        kind=kind,
+        payload=payload,
+        priority=priority,
+        status="queued",
+        attempts=0,
+        max_attempts=settings.INGEST_JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    return job
+
+
+#################################################################################################
+#   Helper function to check whether a file already has a job waiting or running
+#   input: session, file id, output: bool
+#################################################################################################
+def has_active_job(db: Session, file_id) -> bool:
+    return db.execute(
+        select(IngestionJob.id)
+        .where(IngestionJob.file_id == file_id, IngestionJob.status.in_(("queued", "running")))
+        .limit(1)
+    ).first() is not None
+
+
+#################################################################################################
+#   Helper function to requeue (or fail) running jobs whose lease expired
+#   The file of a job failed for good is marked "Failed" in the same transaction (its worker is
+#   gone and will never report it).
+#   output: number of jobs touched
+#################################################################################################
+def reap_expired_jobs():
+    with SessionLocal() as db:
+        rows = db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.status == "running", IngestionJob.locked_until < func.now())
+            .values(
+                status=case((IngestionJob.attempts >= IngestionJob.max_attempts, "failed"), else_="queued"),
+                last_error="lease expired (worker stopped or timed out)",
+                finished_at=case((IngestionJob.attempts >= IngestionJob.max_attempts, func.now()), else_=None),
+                locked_by=None,
+                locked_until=None,
+            )
+            .returning(IngestionJob.file_id, IngestionJob.status)
+        ).all()
+        failed_file_ids = [file_id for file_id, status in rows if status == "failed"]
+        if failed_file_ids:
+            db.execute(update(FileModel).where(FileModel.file_id.in_(failed_file_ids)).values(status="Failed"))
+        db.commit()
+        return len(rows)
+
+
+#################################################################################################
+#   Helper function to claim the next job: highest priority first, then oldest
+#   input: worker name, output: (job id, file id, kind, payload, attempts) or None
+#################################################################################################
+def claim_job(worker_id: str):
+    with SessionLocal() as db:
+        job = db.execute(
+            select(IngestionJob)
+            .where(IngestionJob.status == "queued", IngestionJob.available_at <= func.now())
+            .order_by(IngestionJob.priority.desc(), IngestionJob.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_until = _now() + timedelta(seconds=settings.INGEST_JOB_VISIBILITY_TIMEOUT_SECONDS)
+        db.commit()
+        return job.id, job.file_id, job.kind, dict(job.payload or {}), job.attempts
+
+
+#################################################################################################
+#   Helper function to renew the lease of a running job
+#   output: False when the job is no longer held by this worker (lease lost)
+#################################################################################################
+def extend_job_lease(job_id, worker_id: str) -> bool:
+    with SessionLocal() as db:
+        result = db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.status == "running", IngestionJob.locked_by == worker_id)
+            .values(locked_until=_now() + timedelta(seconds=settings.INGEST_JOB_VISIBILITY_TIMEOUT_SECONDS))
+        )
+        db.commit()
+        return result.rowcount == 1
+
+
+def complete_job(job_id, worker_id: str):
+    with SessionLocal() as db:
+        db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.locked_by == worker_id)
+            .values(status="completed", locked_by=None, locked_until=None, last_error=None, finished_at=func.now())
+        )
+        db.commit()
+
+
+#################################################################################################
+#   Helper function to record a failed attempt
+#   The job is retried after attempts * INGEST_JOB_RETRY_BACKOFF_SECONDS until max_attempts.
+#   output: True when the job will be retried
+#################################################################################################
+def fail_job(job_id, worker_id: str, error: str) -> bool:
+    with SessionLocal() as db:
+        job = db.execute(
+            select(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.locked_by == worker_id)
+            .with_for_update()
+        ).scalar_one_or_none()
+        if job is None:
+            return False
+
+        retry = job.attempts < job.max_attempts
+        job.status = "queued" if retry else "failed"
+        job.last_error = error[:4000]
+        job.locked_by = None
+        job.locked_until = None
+        if retry:
+            job.available_at = _now() + timedelta(seconds=settings.INGEST_JOB_RETRY_BACKOFF_SECONDS * job.attempts)
+        else:
+            job.finished_at = _now()
+        db.commit()
+        return retry
+
+
+#################################################################################################
+#   Helper function to count the jobs per status
+#   output: {"queued": n, "running": n, ...}
+#################################################################################################
+async def job_queue_stats() -> dict:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(IngestionJob.status, func.count()).group_by(IngestionJob.status)
+        )).all()
+        return {status: count for status, count in rows}
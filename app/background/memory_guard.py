@@ -0,0 +1,45 @@
+import psutil
+
+#################################################################################################
+#   Memory ceiling for one ingestion job
+#   Measures the resident memory of the worker process plus its children (the partition pool).
+#   Above SOFT_LIMIT_RATIO of the limit the pipeline stops reading ahead and drains what it
+#   holds; above the limit the job fails with MemoryError (and is retried by the job queue)
+#   instead of taking the whole worker down with the OOM killer.
+#################################################################################################
+SOFT_LIMIT_RATIO = 0.8
+
+
+def current_rss_mb() -> float:
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return rss / 2**20
+
+
+class MemoryGuard:
+    def __init__(self, limit_mb: int):
+        # 0 disables the ceiling, the peak is still tracked
+        self.limit_mb = limit_mb
+        self.peak_mb = 0.0
+        # times the pipeline stopped reading ahead to drain its pages
+        self.soft_limit_drains = 0
+
+    def sample(self) -> float:
+        rss_mb = current_rss_mb()
+        self.peak_mb = max(self.peak_mb, rss_mb)
+        return rss_mb
+
+    def over_soft_limit(self) -> bool:
+        # always sampled, so the peak is tracked without a ceiling too
+        rss_mb = self.sample()
+        return bool(self.limit_mb) and rss_mb > self.limit_mb * SOFT_LIMIT_RATIO
+
+    def check(self):
+        rss_mb = self.sample()
+        if self.limit_mb and rss_mb > self.limit_mb:
+            raise MemoryError(f"Ingestion uses {rss_mb:.0f} MB, above INGEST_MEMORY_LIMIT_MB={self.limit_mb}")
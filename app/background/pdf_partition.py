@@ -0,0 +1,215 @@
+import base64
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+
+import pdfplumber
+from pypdf import PdfReader, PdfWriter
+
+from app.core.config import settings
+
+#################################################################################################
+#   Page-parallel PDF partitioning
+#   hi_res partitioning (yolox layout detection + OCR) is CPU bound and single threaded per call.
+#   The PDF is split into page ranges, every range is partitioned in its own process and the
+#   pages come back in document order as plain, picklable parts:
+#       {"type": "text", "text": ...} or {"type": "image", "image_base64": ... or None}
+#   together with the strategy the page was partitioned with ("fast" or "hi_res").
+#################################################################################################
+
+def count_pdf_pages(pdf_path: str) -> int:
+    return len(PdfReader(pdf_path).pages)
+
+
+def split_page_ranges(total_pages: int, pages_per_range: int, skip_pages=()):
+    # 0-based, end exclusive; skip_pages (1-based, e.g. checkpointed pages) split the ranges
+    ranges = []
+    start = None
+    for index in range(total_pages + 1):
+        pending = index < total_pages and (index + 1) not in skip_pages
+        if start is not None and (not pending or index - start == pages_per_range):
+            ranges.append((start, index))
+            start = None
+        if pending and start is None:
+            start = index
+    return ranges
+
+
+def _image_base64(element):
+    # the attribute holding the image differs between unstructured versions / settings
+    if getattr(element.metadata, "image_base64", None):
+        return element.metadata.image_base64
+    image_data = None
+    if hasattr(element, "image"):
+        image_data = element.image
+    elif hasattr(element.metadata, "image"):
+        image_data = element.metadata.image
+    elif getattr(element.metadata, "image_path", None):
+        with open(element.metadata.image_path, "rb") as img_file:
+            image_data = img_file.read()
+    if image_data is None:
+        return None
+    return base64.b64encode(image_data).decode("utf-8")
+
+
+#################################################################################################
+#   Helper function to pick the partition strategy of a page from its text layer
+#   "fast" (pdfminer text extraction, no layout model) when the page has enough extractable,
+#   decodable text, no table and little image area; "hi_res" (yolox + OCR) otherwise
+#   input: pdfplumber page, output: "fast" or "hi_res"
+#################################################################################################
+def choose_page_strategy(page) -> str:
+    if not settings.INGEST_FAST_PATH_ENABLED:
+        return "hi_res"
+
+    text = page.extract_text() or ""
+    # "(cid:12)" glyphs: the font has no unicode map, the text layer is unusable
+    if len(text.strip()) < settings.INGEST_FAST_MIN_CHARS or text.count("(cid:") * 20 > len(text):
+        return "hi_res"
+
+    page_area = float(page.width * page.height) or 1.0
+    image_area = sum(
+        max(image["x1"] - image["x0"], 0) * max(image["bottom"] - image["top"], 0)
+        for image in page.images
+    )
+    if image_area / page_area > settings.INGEST_FAST_MAX_IMAGE_RATIO:
+        return "hi_res"
+
+    if page.find_tables():
+        return "hi_res"
+    return "fast"
+
+
+def _strategy_runs(strategies, start: int):
+    # consecutive pages with the same strategy -> (strategy, [page indexes])
+    runs = []
+    for offset, strategy in enumerate(strategies):
+        if runs and runs[-1][0] == strategy:
+            runs[-1][1].append(start + offset)
+        else:
+            runs.append((strategy, [start + offset]))
+    return runs
+
+
+#################################################################################################
+#   Runs in a pool process: partitions pages [start, end) of the PDF
+#   Every page gets its own strategy (choose_page_strategy); consecutive pages with the same
+#   strategy are partitioned together.
+#   input: pdf path, page range, output: list of (page number, parts, strategy), 1-based pages,
+#   one per page of the range (parts empty for a page without elements)
+#################################################################################################
+def partition_page_range(pdf_path: str, start: int, end: int):
+    # imported in the pool process only, loading the layout model is expensive
+    from unstructured.partition.pdf import partition_pdf
+    from unstructured.documents.elements import Image
+
+    with pdfplumber.open(pdf_path, pages=list(range(start + 1, end + 1))) as pdf:
+        strategies = [choose_page_strategy(page) for page in pdf.pages]
+
+    reader = PdfReader(pdf_path)
+    pages = {}
+    page_strategies = {}
+
+    with tempfile.TemporaryDirectory(prefix="partition_") as work_dir:
+        for run_index, (strategy, page_indexes) in enumerate(_strategy_runs(strategies, start)):
+            writer = PdfWriter()
+            for page_index in page_indexes:
+                writer.add_page(reader.pages[page_index])
+                page_strategies[page_index + 1] = strategy
+            run_path = os.path.join(work_dir, f"pages_{run_index}.pdf")
+            with open(run_path, "wb") as run_file:
+                writer.write(run_file)
+
+            if strategy == "fast":
+                elements = partition_pdf(filename=run_path, strategy="fast")
+            else:
+                elements = partition_pdf(
+                    filename=run_path,
+                    strategy="hi_res",
+                    infer_table_structure=True,
+                    model_name="yolox",
+                    extract_image_block_types=["Image"],
+                    # images come back base64 encoded in the element metadata, nothing on disk
+                    extract_image_block_to_payload=True,
+                )
+
+            for el in elements:
+                page_no = page_indexes[(el.metadata.page_number or 1) - 1] + 1
+                if isinstance(el, Image):
+                    pages.setdefault(page_no, []).append({"type": "image", "image_base64": _image_base64(el)})
+                elif hasattr(el, "text"):
+                    pages.setdefault(page_no, []).append({"type": "text", "text": el.text})
+
+    # every page of the range, the ones without elements too (they are checkpointed as empty)
+    return [(page_no, pages.get(page_no, []), page_strategies[page_no]) for page_no in range(start + 1, end + 1)]
+
+
+#################################################################################################
+#   Generator over the partitioned pages of a PDF, in document order
+#   Ranges are partitioned by INGEST_PARTITION_PROCESSES processes. Only a window of ranges is
+#   in flight (one per process plus the one being consumed) and a range's pages are dropped once
+#   yielded, so memory depends on the window, not on the document size. With a memory guard
+#   the window shrinks to the range being consumed while memory is above the soft limit.
+#   Pages in skip_pages (1-based) are not partitioned.
+#   input: pdf path, page count, optional MemoryGuard, output: (page number, parts, strategy)
+#################################################################################################
+def partition_pdf_parallel(pdf_path: str, total_pages: int, memory_guard=None, skip_pages=()):
+    ranges = split_page_ranges(total_pages, settings.INGEST_PAGES_PER_RANGE, skip_pages)
+    if not ranges:
+        return
+    processes = max(1, min(settings.INGEST_PARTITION_PROCESSES or os.cpu_count() or 1, len(ranges)))
+    max_tasks_per_child = settings.INGEST_PARTITION_MAX_TASKS_PER_CHILD or None
+
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=max_tasks_per_child,
+    ) as executor:
+        in_flight = deque()
+        next_range = 0
+        try:
+            while next_range < len(ranges) or in_flight:
+                while next_range < len(ranges) and len(in_flight) <= processes:
+                    if in_flight and memory_guard is not None and memory_guard.over_soft_limit():
+                        break
+                    start, end = ranges[next_range]
+                    in_flight.append(executor.submit(partition_page_range, pdf_path, start, end))
+                    next_range += 1
+
+                pages = in_flight.popleft().result()
+                while pages:
+                    yield pages.pop(0)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+#################################################################################################
+#   Runs handle_page(page_no, parts, strategy) over partitioned pages, `concurrency` at a time
+#   Only a few partitioned pages wait for a thread (the partitioner is usually faster). Near the
+#   memory ceiling (MemoryGuard soft limit) everything held is finished before reading further,
+#   then the hard limit is checked. The first failing page raises.
+#   input: (page_no, parts, strategy) iterator, page handler, MemoryGuard, thread count
+#################################################################################################
+def run_pages_bounded(pages, handle_page, memory_guard, concurrency: int):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        for page_no, parts, strategy in pages:
+            pending.add(executor.submit(handle_page, page_no, parts, strategy))
+            del parts
+
+            if memory_guard.over_soft_limit():
+                finished = wait(pending).done
+                pending = set()
+                memory_guard.soft_limit_drains += 1
+            elif len(pending) >= concurrency * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                continue
+            for future in finished:
+                future.result()
+            memory_guard.check()
+        for future in pending:
+            future.result()
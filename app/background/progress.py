@@ -0,0 +1,208 @@
+import asyncio
+import re
+import threading
+import time
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.models.files import File as FileModel
+from app.db.models.ingestion_jobs import IngestionJob
+from app.db.session import SessionLocal, AsyncSessionLocal
+
+#################################################################################################
+#   Ingestion progress
+#   Workers write fileinfo.status / parse_stats straight to postgres (no HTTP call back into the
+#   API, so BASE_URL does not have to be reachable from the workers). Page progress goes through
+#   ProgressReporter, which coalesces it to at most one write per INGEST_PROGRESS_INTERVAL_SECONDS
+#   per job. The API streams the row to the frontend with GET /files/{id}/progress (SSE); all
+#   the clients following one file share a single reader of its row (watch_file_progress).
+#################################################################################################
+PAGE_PROGRESS_PATTERN = re.compile(r"^(\d+)/(\d+)$")
+
+
+#################################################################################################
+#   Helper function to set the status (and parse stats) of a file
+#   A failed write is logged, never raised: progress must not fail an ingestion.
+#################################################################################################
+def update_file_status(file_id: str, status: str, parse_stats: dict = None):
+    values = {"status": status}
+    if parse_stats is not None:
+        values["parse_stats"] = parse_stats
+    try:
+        with SessionLocal() as db:
+            db.execute(update(FileModel).where(FileModel.file_id == file_id).values(**values))
+            db.commit()
+    except Exception as e:
+        print(f"Failed to update file status: {e}")
+
+
+#################################################################################################
+#   Coalesced status writer of one job (thread safe, pages finish on several threads)
+#   report(): keeps the latest status; written at once if the last write is older than the
+#             interval, otherwise by a timer when the interval is over
+#   finish(): final status (and parse stats), written at once, drops what is pending
+#################################################################################################
+class ProgressReporter:
+    def __init__(self, file_id: str, interval: float = None):
+        self.file_id = file_id
+        self.interval = settings.INGEST_PROGRESS_INTERVAL_SECONDS if interval is None else interval
+        self._lock = threading.Lock()
+        self._pending = None
+        self._last_write = 0.0
+        self._timer = None
+
+    def report(self, status: str):
+        with self._lock:
+            self._pending = status
+            wait = self._last_write + self.interval - time.monotonic()
+            if wait <= 0:
+                self._write_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            self._write_pending()
+
+    def finish(self, status: str, parse_stats: dict = None):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+            self._last_write = time.monotonic()
+            update_file_status(self.file_id, status, parse_stats)
+
+    def cancel(self):
+        # the job stopped being ours: drop what is pending, write nothing more
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+
+    def _write_pending(self):
+        # called with the lock held, so writes of one job never overtake each other
+        if self._pending is None:
+            return
+        status, self._pending = self._pending, None
+        self._last_write = time.monotonic()
+        update_file_status(self.file_id, status)
+
+
+#################################################################################################
+#   Helper function to read the progress of a file (used by the SSE endpoint)
+#   output: {"status", "pages_done", "pages_total", "parse_stats", "active"} or None if no file
+#   "active": a job of the file is queued or running, i.e. a "Failed" status is not final yet
+#################################################################################################
+async def read_file_progress(file_id) -> dict:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(FileModel.status, FileModel.parse_stats).where(FileModel.file_id == file_id)
+        )).first()
+        if row is None:
+            return None
+        active = (await db.execute(
+            select(IngestionJob.id)
+            .where(IngestionJob.file_id == file_id, IngestionJob.status.in_(("queued", "running")))
+            .limit(1)
+        )).first() is not None
+
+    match = PAGE_PROGRESS_PATTERN.match(row.status or "")
+    return {
+        "status": row.status,
+        "pages_done": int(match.group(1)) if match else None,
+        "pages_total": int(match.group(2)) if match else None,
+        "parse_stats": row.parse_stats,
+        "active": active,
+    }
+
+
+def is_final_progress(progress: dict) -> bool:
+    return progress["status"] == "Completed" or (progress["status"] == "Failed" and not progress["active"])
+
+
+#################################################################################################
+#   Shared reader of the progress of one file (per API process)
+#   Reads the row every INGEST_PROGRESS_INTERVAL_SECONDS while at least one client follows the
+#   file, and stops once the file is gone, final, or the read failed. Clients wait on the
+#   condition for the next change; the database load does not grow with the number of clients.
+#################################################################################################
+class _FileProgressReader:
+    def __init__(self, file_id):
+        self.file_id = file_id
+        self.subscribers = 0
+        self.version = 0
+        self.progress = None
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.task = None
+
+    async def _publish(self, progress: dict = None, error: str = None):
+        async with self.changed:
+            self.progress = progress
+            self.error = error
+            self.version += 1
+            self.changed.notify_all()
+
+    async def run(self):
+        last_progress = None
+        while True:
+            try:
+                progress = await read_file_progress(self.file_id)
+            except Exception as e:
+                await self._publish(error=str(e))
+                return
+            if self.version == 0 or progress != last_progress:
+                last_progress = progress
+                await self._publish(progress)
+            if progress is None or is_final_progress(progress):
+                return
+            await asyncio.sleep(settings.INGEST_PROGRESS_INTERVAL_SECONDS)
+
+
+_progress_readers = {}
+
+
+#################################################################################################
+#   Async generator over the progress changes of a file, through the shared reader
+#   Yields the progress dict on every change, and None when nothing changed for `timeout`
+#   seconds (lets the caller send a keep-alive). Raises LookupError once the file is gone, and
+#   RuntimeError when the row could not be read.
+#################################################################################################
+async def watch_file_progress(file_id, timeout: float):
+    file_id = str(file_id)
+    reader = _progress_readers.get(file_id)
+    if reader is None:
+        reader = _progress_readers[file_id] = _FileProgressReader(file_id)
+        reader.task = asyncio.create_task(reader.run())
+    reader.subscribers += 1
+
+    seen = 0
+    try:
+        while True:
+            async with reader.changed:
+                try:
+                    await asyncio.wait_for(reader.changed.wait_for(lambda: reader.version != seen), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                version, progress, error = reader.version, reader.progress, reader.error
+            if version == seen:
+                yield None
+                continue
+            seen = version
+            if error is not None:
+                raise RuntimeError(error)
+            if progress is None:
+                raise LookupError("File not found")
+            yield progress
+    finally:
+        reader.subscribers -= 1
+        if reader.subscribers == 0:
+            reader.task.cancel()
+            if _progress_readers.get(file_id) is reader:
+                del _progress_readers[file_id]
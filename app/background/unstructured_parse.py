@@ -1,19 +1,19 @@
 
-import base64
-import io
-import shutil
-from PIL import Image as PILImage
-import os
-from openai import OpenAI
-from unstructured.partition.pdf import partition_pdf
-from unstructured.documents.elements import Image
-import requests
+import threading
+import time
 from app.core.config import settings
-from app.helpers.file_parsing.image_description import generate_image_description
-from app.helpers.file_parsing.clean_page_content import clean_page_content
+from app.helpers.file_parsing.image_description import describe_image
+from app.helpers.file_parsing.clean_page_content import clean_page, BoilerplateTracker
 from app.helpers.file_parsing.generate_chunk_summary import generate_summary
 from app.helpers.qdrant_functions import upload_to_qdrant, make_collection, delete_points_by_uuid
-from app.helpers.semantic_chunk import create_semantic_chunks_80
+from app.helpers.semantic_chunk import create_semantic_chunks
+from app.helpers.answer_cache import invalidate_answer_cache
+from app.background.pdf_partition import count_pdf_pages, partition_pdf_parallel, run_pages_bounded
+from app.background.memory_guard import MemoryGuard
+from app.background.dedupe import file_content_hash, page_content_hash, find_ingested_duplicate, reuse_file_points, reuse_page_points
+from app.background.checkpoints import load_checkpoints, save_checkpoint, clear_checkpoints
+from app.background.progress import update_file_status, ProgressReporter
+from app.background.job_queue import IngestionAborted, file_exists
 
 # def process_pdf(file_content: bytes, file_id: str, file_url: str):
     
@@ -65,92 +65,198 @@ from app.helpers.semantic_chunk import create_semantic_chunks_80
 #         if os.path.exists(temp_pdf_path):
 #             os.remove(temp_pdf_path)
 
-def process_pdf(file_content: bytes, file_id: str, file_url:str, file_name:str):
-    temp_pdf_path = f"temp_{file_id}.pdf"
+#################################################################################################
+#   Ingestion of one PDF
+#   stage 1: page ranges are partitioned in a process pool (pdf_partition), pages arrive in order
+#   stage 2: every page is described / cleaned / chunked / summarized / uploaded in a thread pool,
+#            INGEST_PAGE_CONCURRENCY pages at a time (these stages wait on OpenAI and qdrant)
+#   Point ids are deterministic, so pages can be uploaded in any order.
+#   Pages with a usable text layer take the fast path (see choose_page_strategy); the number of
+#   pages per strategy ends up in fileinfo.parse_stats.
+#   The PDF is read from disk; at no point is the whole document (or all its elements) in memory,
+#   a page's parts are released as soon as the page is uploaded. INGEST_MEMORY_LIMIT_MB caps RSS.
+#   Every uploaded page is checkpointed (see checkpoints). A failure keeps the points written so
+#   far; the next attempt resumes with the pages that have no checkpoint.
+#   Pages stop (IngestionAborted) once abort_event is set (the worker lost the job lease) or the
+#   file was deleted; points written for a deleted file are removed again.
+#################################################################################################
+def process_pdf_file(pdf_path: str, file_id: str, file_url:str, file_name:str, content_hash: str = None, abort_event=None):
+    memory_guard = MemoryGuard(settings.INGEST_MEMORY_LIMIT_MB)
+    reporter = None
+    started = time.perf_counter()
+    strategy_counts = {"fast": 0, "hi_res": 0}
+
+    def ensure_still_wanted():
+        if abort_event is not None and abort_event.is_set():
+            raise IngestionAborted("job lease lost")
+        if not file_exists(file_id):
+            raise IngestionAborted("file deleted")
+
+    def between_copy_batches():
+        memory_guard.check()
+        ensure_still_wanted()
+
     try:
         make_collection(str(settings.COLLECTION_NAME_RISK_MANAGEMENT))
-        with open(temp_pdf_path, "wb") as temp_file:
-            temp_file.write(file_content)
-        elements = partition_pdf(
-            filename=temp_pdf_path,
-            strategy="hi_res",
-            extract_images_in_pdf=True,
-            infer_table_structure=True,
-            model_name="yolox"
-        )
-        total_pages = max(el.metadata.page_number for el in elements)
-        content_parts = []  # Declare content_parts here
-        current_page = 0
-        for el in elements:
-            if el.metadata.page_number != current_page:
-                if current_page > 0:
-                    update_file_status(file_id, f"{current_page}/{total_pages}")
-                    page_content = "\n".join(content_parts)
-                    cleaned_page_content = clean_page_content(page_content)
-                    
-                    semantic_chunks = create_semantic_chunks_80(cleaned_page_content)
-                    
-                    summaries = generate_summary(semantic_chunks)
-                    
-                    upload_to_qdrant(file_id, file_url,file_name, str(current_page), semantic_chunks, summaries, str(settings.COLLECTION_NAME_RISK_MANAGEMENT))
-                   
-                    content_parts.clear()
-                current_page = el.metadata.page_number
 
-            if isinstance(el, Image):
-                image_description = process_image(el)
-                content_parts.append(f"[Image Description: {image_description}]\n")
-            elif hasattr(el, "text"):
-                content_parts.append(el.text)
-
-        # Process the content for the last page
-        update_file_status(file_id, f"{total_pages}/{total_pages}")
-        page_content = "\n".join(content_parts)
-        cleaned_page_content = clean_page_content(page_content)
-        semantic_chunks = create_semantic_chunks_80(cleaned_page_content)
-        summaries = generate_summary(semantic_chunks)
+        # identical file already ingested: copy its points, parse nothing
+        content_hash = content_hash or file_content_hash(pdf_path)
+        duplicate_of = find_ingested_duplicate(content_hash, file_id)
+        if duplicate_of is not None:
+            points = reuse_file_points(str(duplicate_of), file_id, file_url, file_name, between_copy_batches)
+            ensure_still_wanted()
+            parse_stats = {
+                "duplicate_of": str(duplicate_of),
+                "points": points,
+                "parse_seconds": round(time.perf_counter() - started, 1),
+                "peak_memory_mb": round(memory_guard.peak_mb),
+            }
+            print(f"PDF {file_id} is identical to {duplicate_of}: {parse_stats}")
+            update_file_status(file_id, "Completed", parse_stats)
+            return
+
+        total_pages = count_pdf_pages(pdf_path)
+        checkpoints = load_checkpoints(file_id)
+        if checkpoints:
+            print(f"PDF {file_id}: resuming, {len(checkpoints)}/{total_pages} pages already ingested")
+        progress = {"done": len(checkpoints), "reused": 0, "empty": 0}
+        cleaning = {}
+        for page_no, checkpoint in checkpoints.items():
+            if checkpoint["page_hash"] is None:
+                progress["empty"] += 1
+                continue
+            if checkpoint["strategy"] in strategy_counts:
+                strategy_counts[checkpoint["strategy"]] += 1
+            if checkpoint["cleaning"] is None:
+                progress["reused"] += 1
+            else:
+                cleaning[str(page_no)] = checkpoint["cleaning"]
+        progress_lock = threading.Lock()
+        boilerplate = BoilerplateTracker()
+        reporter = ProgressReporter(file_id)
+
+        def run_page(page_no, parts, strategy):
+            ensure_still_wanted()
+            if parts:
+                page = process_page(file_id, file_url, file_name, page_no, parts, boilerplate)
+            else:
+                # nothing partitioned (blank page): checkpointed anyway, so a retry does not
+                # partition it again
+                page = {"page_hash": None, "point_ids": [], "cleaning": None}
+            # the file may have been deleted while the page was processed
+            ensure_still_wanted()
+            save_checkpoint(file_id, page_no, page["page_hash"], page["point_ids"], strategy, page["cleaning"])
+            with progress_lock:
+                progress["done"] += 1
+                if not parts:
+                    progress["empty"] += 1
+                else:
+                    strategy_counts[strategy] += 1
+                    if page["cleaning"] is None:
+                        progress["reused"] += 1
+                    else:
+                        cleaning[str(page_no)] = page["cleaning"]
+                done = progress["done"]
+            reporter.report(f"{done}/{total_pages}")
 
-        upload_to_qdrant(file_id,file_url,file_name, str(current_page), semantic_chunks, summaries, str(settings.COLLECTION_NAME_RISK_MANAGEMENT))
+        run_pages_bounded(
+            partition_pdf_parallel(pdf_path, total_pages, memory_guard, set(checkpoints)),
+            run_page,
+            memory_guard,
+            settings.INGEST_PAGE_CONCURRENCY,
+        )
 
-        update_file_status(file_id, "Completed")
+        parse_stats = {
+            "pages": total_pages,
+            "fast_pages": strategy_counts["fast"],
+            "hi_res_pages": strategy_counts["hi_res"],
+            "empty_pages": progress["empty"],
+            "reused_pages": progress["reused"],
+            "resumed_pages": len(checkpoints),
+            "llm_cleaned_pages": sum(1 for decision in cleaning.values() if decision["decision"] == "llm"),
+            "heuristic_cleaned_pages": sum(1 for decision in cleaning.values() if decision["decision"] == "heuristic"),
+            # per page: {"decision", "garbage_ratio", "broken_hyphen_ratio", "dictionary_hit_rate"}
+            "cleaning": cleaning,
+            "parse_seconds": round(time.perf_counter() - started, 1),
+            "peak_memory_mb": round(memory_guard.peak_mb),
+            "memory_drains": memory_guard.soft_limit_drains,
+        }
+        print(f"PDF {file_id} ingested: {parse_stats}")
+        reporter.finish("Completed", parse_stats)
+        clear_checkpoints(file_id)
     except Exception as e:
         print(f"Error processing PDF: {e}")
-        update_file_status(file_id, "Failed")
-        # here you may actually call the delete qdrant function and delete all the points. But I would like to keep the partial results
-        delete_points_by_uuid(str(settings.COLLECTION_NAME_RISK_MANAGEMENT), str(file_id))
+        try:
+            file_deleted = not file_exists(file_id)
+        except Exception:
+            file_deleted = False
+        if file_deleted:
+            # deleted during ingestion: the delete endpoint removed the points written before it,
+            # remove the ones written since
+            if reporter is not None:
+                reporter.cancel()
+            delete_points_by_uuid(str(settings.COLLECTION_NAME_RISK_MANAGEMENT), str(file_id))
+            raise IngestionAborted("file deleted") from e
+        if isinstance(e, IngestionAborted):
+            # lease lost: the job (and the file status) belongs to whoever holds it now
+            if reporter is not None:
+                reporter.cancel()
+            raise
+        if reporter is not None:
+            reporter.finish("Failed")
+        else:
+            update_file_status(file_id, "Failed")
+        # the points of the checkpointed pages are kept, the retry (job queue or
+        # POST /files/{id}/retry) resumes from them; deleting the file removes them
+        raise
     finally:
-        if os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
+        # The collection changed (points added or rolled back), cached answers may be stale
+        invalidate_answer_cache(str(settings.COLLECTION_NAME_RISK_MANAGEMENT))
+
+#################################################################################################
+#   Per-page pipeline: image descriptions -> cleaning -> semantic chunks -> summaries -> qdrant
+#   A page whose content was ingested before (same page hash) reuses those points instead.
+#   input: file info, page number, partitioned parts of the page, boilerplate tracker of the
+#   document, output: {"page_hash", "point_ids", "cleaning"} (cleaning None if the page was reused)
+#################################################################################################
+def process_page(file_id: str, file_url: str, file_name: str, page_no: int, parts, boilerplate: BoilerplateTracker = None):
+    page_hash = page_content_hash(parts)
+    reused_point_ids = reuse_page_points(page_hash, file_id, file_url, file_name, str(page_no))
+    if reused_point_ids is not None:
+        return {"page_hash": page_hash, "point_ids": reused_point_ids, "cleaning": None}
+
+    content_parts = []
+    for part in parts:
+        if part["type"] == "image":
+            image_description = process_image(part["image_base64"], file_id)
+            if image_description is not None:
+                content_parts.append(f"[Image Description: {image_description}]\n")
+        else:
+            content_parts.append(part["text"])
+
+    page_content = "\n".join(content_parts)
+    cleaned_page_content, cleaning_decision = clean_page(page_content, boilerplate)
+    semantic_chunks = create_semantic_chunks(cleaned_page_content)
+    if settings.CHUNK_VECTOR_MODE == "mean":
+        # chunk vectors come from the sentence vectors, a summary would never be embedded
+        summaries = [""] * len(semantic_chunks)
+    else:
+        summaries = generate_summary(semantic_chunks)
 
-        # Deleting the 'figures' folder. It is created temporarily - I donno whether it impacts multiple background file processing
-        figures_folder = f"figures"
-        if os.path.exists(figures_folder):
-            shutil.rmtree(figures_folder)
+    point_ids = upload_to_qdrant(file_id, file_url, file_name, str(page_no), semantic_chunks, summaries, str(settings.COLLECTION_NAME_RISK_MANAGEMENT), page_hash)
+    return {"page_hash": page_hash, "point_ids": point_ids, "cleaning": cleaning_decision}
 
-def process_image(image_element):
+#################################################################################################
+#   Helper function to describe one extracted image (cached, see describe_image)
+#   input: base64 image, id of its file, output: description, or None for decorative images
+#################################################################################################
+def process_image(base64_image, file_id: str = None):
     try:
-        # # Debug: Print the attributes of image_element and its metadata
-        # print("Image element attributes:", dir(image_element))
-        # print("Image element metadata attributes:", dir(image_element.metadata))
-        
-        # I am Trying different possible attributes for image data
-        image_data = None
-        if hasattr(image_element, 'image'):
-            image_data = image_element.image
-        elif hasattr(image_element.metadata, 'image'):
-            image_data = image_element.metadata.image
-        elif hasattr(image_element.metadata, 'image_path'):
-            with open(image_element.metadata.image_path, "rb") as img_file:
-                image_data = img_file.read()
-
-        if image_data is None:
+        if base64_image is None:
             print("Unable to find image data. Skipping image processing.")
             return "[Image data not found]"
-        
-        base64_image = base64.b64encode(image_data).decode('utf-8')
 
-        
-        image_description = generate_image_description(base64_image)
+        image_description = describe_image(base64_image, file_id)
 
         return image_description
 
@@ -166,10 +272,3 @@ def save_content_to_file(content, filename):
         print(f"Content saved to {filename}")
     except Exception as e:
         print(f"Error saving content to file: {e}")
-
-def update_file_status(file_id: str, status: str):
-    
-    update_url = f"{settings.BASE_URL}/api/v1/files/{file_id}"
-    response = requests.put(update_url, json={"status": status})
-    if response.status_code != 200:
-        print(f"Failed to update file status: {response.text}")
\ No newline at end of file
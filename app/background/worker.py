@@ -0,0 +1,143 @@
+#################################################################################################
+#   Ingestion worker pool
+#
+#       python -m app.background.worker --concurrency 2
+#
+#   Runs next to (not inside) the API: every worker process claims jobs from the ingestion_jobs
+#   table, runs them and renews the job lease while it works. SIGTERM / Ctrl+C lets the running
+#   jobs finish; a worker that crashes is replaced and its job is picked up again once the
+#   lease expires.
+#################################################################################################
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import threading
+import traceback
+
+from app.core.config import settings
+# every model, so relationships between them (fileinfo -> users) resolve in the worker too
+import app.db.base  # noqa: F401
+from app.core.llm_governor import llmGovernor, BACKGROUND
+from app.background.job_queue import claim_job, extend_job_lease, complete_job, fail_job, reap_expired_jobs, IngestionAborted
+from app.background.progress import update_file_status
+
+
+def run_process_pdf(file_id: str, payload: dict, abort_event: threading.Event):
+    # imported here so the parsing stack (unstructured, yolox) only loads in the worker processes
+    from app.background.unstructured_parse import process_pdf_file
+    from app.helpers.supabase_bucket_insert import download_file_to_path
+
+    fd, pdf_path = tempfile.mkstemp(prefix=f"ingest_{file_id}_", suffix=".pdf")
+    os.close(fd)
+    try:
+        download_file_to_path(payload["file_url"], pdf_path)
+        process_pdf_file(pdf_path, file_id, payload["file_url"], payload["file_name"], payload.get("content_hash"), abort_event)
+    finally:
+        os.remove(pdf_path)
+
+
+JOB_HANDLERS = {
+    "process_pdf": run_process_pdf,
+}
+
+
+# renews the lease; when it is lost (reaped, or the job row went with its deleted file) the
+# handler is told to stop through lost, another worker may already run the job
+def _keep_lease(job_id, worker_id: str, done: threading.Event, lost: threading.Event):
+    interval = max(settings.INGEST_JOB_VISIBILITY_TIMEOUT_SECONDS / 3, 1)
+    while not done.wait(interval):
+        try:
+            if not extend_job_lease(job_id, worker_id):
+                print(f"[{worker_id}] lost the lease of job {job_id}, aborting it")
+                lost.set()
+                return
+        except Exception as e:
+            print(f"[{worker_id}] could not renew the lease of job {job_id}: {e}")
+
+
+def run_job(worker_id: str, job):
+    job_id, file_id, kind, payload, attempts = job
+    print(f"[{worker_id}] job {job_id} ({kind}, file {file_id}, attempt {attempts}) started")
+
+    done = threading.Event()
+    lost = threading.Event()
+    heartbeat = threading.Thread(target=_keep_lease, args=(job_id, worker_id, done, lost), daemon=True)
+    heartbeat.start()
+    try:
+        JOB_HANDLERS[kind](str(file_id), payload, lost)
+        complete_job(job_id, worker_id)
+        print(f"[{worker_id}] job {job_id} completed")
+    except IngestionAborted as e:
+        # nothing to record: the job is no longer ours (or no longer exists)
+        print(f"[{worker_id}] job {job_id} aborted: {e}")
+    except Exception as e:
+        retry = fail_job(job_id, worker_id, traceback.format_exc())
+        print(f"[{worker_id}] job {job_id} failed: {e} ({'will retry' if retry else 'giving up'})")
+        if retry:
+            update_file_status(str(file_id), f"queued (retry {attempts + 1})")
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def worker_loop(index: int, stop_event):
+    # the parent handles Ctrl+C / SIGTERM and tells the workers to stop through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    # ingestion LLM calls leave LLM_INTERACTIVE_RESERVE of the OpenAI budgets to chat
+    llmGovernor.default_lane = BACKGROUND
+    print(f"[{worker_id}] waiting for jobs")
+
+    while not stop_event.is_set():
+        try:
+            reap_expired_jobs()
+            job = claim_job(worker_id)
+        except Exception as e:
+            print(f"[{worker_id}] job queue unavailable: {e}")
+            job = None
+
+        if job is None:
+            stop_event.wait(settings.INGEST_WORKER_POLL_SECONDS)
+            continue
+        run_job(worker_id, job)
+
+    print(f"[{worker_id}] stopped")
+
+
+def main(concurrency: int):
+    # spawn: no database connections or client sockets are shared with the children
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+
+    def request_stop(signum, frame):
+        print("Stopping workers after their current job...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    processes = {}
+    while not stop_event.is_set():
+        for index in range(concurrency):
+            process = processes.get(index)
+            if process is None or not process.is_alive():
+                if process is not None:
+                    print(f"Worker {index} exited with code {process.exitcode}, restarting")
+                process = context.Process(target=worker_loop, args=(index, stop_event), daemon=False)
+                process.start()
+                processes[index] = process
+        stop_event.wait(1)
+
+    for process in processes.values():
+        process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BankGPT ingestion worker pool")
+    parser.add_argument("--concurrency", type=int, default=settings.INGEST_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    main(args.concurrency)
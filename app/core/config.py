@@ -13,8 +13,122 @@ class Settings(BaseSettings):
     QDRANT_HOST: str = os.getenv("QDRANT_HOST")
     QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY")
     COLLECTION_NAME_RISK_MANAGEMENT: str = os.getenv("COLLECTION_NAME_RISK_MANAGEMENT")
+    # text-embedding-3-large is 3072 dims; smaller values use Matryoshka truncation (e.g. 1024, 512)
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", 3072))
+    # "none", "scalar" (int8, 4x smaller) or "binary" (32x smaller) quantization of the dense vectors
+    QDRANT_QUANTIZATION: str = os.getenv("QDRANT_QUANTIZATION", "none")
+    QDRANT_OVERSAMPLING: float = float(os.getenv("QDRANT_OVERSAMPLING", 2.0))
     BASE_URL: str = os.getenv("BASE_URL")
     BANK_NAME: str = os.getenv("BANK_NAME")
 
+    # Query embedding cache (in-process LRU + optional postgres tier shared by all workers)
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", 4096))
+    EMBEDDING_CACHE_TTL_SECONDS: int = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    EMBEDDING_CACHE_SHARED: bool = os.getenv("EMBEDDING_CACHE_SHARED", "false").lower() == "true"
+
+    # Semantic answer cache for first messages (cosine distance = 1 - cosine similarity)
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_MAX_DISTANCE: float = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", 0.05))
+
+    # Conversation memory: rolling summary + last N messages within a token budget
+    MEMORY_RECENT_MESSAGES: int = int(os.getenv("MEMORY_RECENT_MESSAGES", 6))
+    MEMORY_TOKEN_BUDGET: int = int(os.getenv("MEMORY_TOKEN_BUDGET", 3000))
+    MEMORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", 400))
+
+    # Retrieval for follow-up messages: "serial" (rewrite, then search) or "parallel"
+    # (raw + rewritten searches at the same time, merged with reciprocal rank fusion)
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "parallel")
+    RETRIEVAL_REWRITES: int = int(os.getenv("RETRIEVAL_REWRITES", 2))
+    RETRIEVAL_RRF_K: int = int(os.getenv("RETRIEVAL_RRF_K", 60))
+
+    # Hybrid dense + sparse (BM25) search, fused server-side by qdrant
+    HYBRID_SEARCH_ENABLED: bool = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    HYBRID_PREFETCH_MULTIPLIER: int = int(os.getenv("HYBRID_PREFETCH_MULTIPLIER", 3))
+
+    # Knowledge context assembly (adaptive top-k, dedupe, token budget)
+    RETRIEVAL_CANDIDATES: int = int(os.getenv("RETRIEVAL_CANDIDATES", 20))
+    CONTEXT_MAX_CHUNKS: int = int(os.getenv("CONTEXT_MAX_CHUNKS", 8))
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2500))
+    # cosine scores only, fused (RRF) results are not cut
+    CONTEXT_MIN_RELATIVE_SCORE: float = float(os.getenv("CONTEXT_MIN_RELATIVE_SCORE", 0.65))
+    CONTEXT_MMR_LAMBDA: float = float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+    CONTEXT_DUPLICATE_THRESHOLD: float = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.6))
+
+    # Ingestion writer: chunks per embeddings request (API max 2048 inputs / 300k tokens),
+    # points per qdrant upsert, and how many of those requests may be in flight at once
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 200000))
+    QDRANT_UPSERT_BATCH_SIZE: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 256))
+    QDRANT_UPSERT_WAIT: bool = os.getenv("QDRANT_UPSERT_WAIT", "true").lower() == "true"
+    INGEST_MAX_IN_FLIGHT: int = int(os.getenv("INGEST_MAX_IN_FLIGHT", 4))
+
+    # Ingestion job queue (postgres) and the worker pool started with `python -m app.background.worker`
+    INGEST_WORKER_CONCURRENCY: int = int(os.getenv("INGEST_WORKER_CONCURRENCY", 2))
+    INGEST_WORKER_POLL_SECONDS: float = float(os.getenv("INGEST_WORKER_POLL_SECONDS", 2.0))
+    INGEST_JOB_VISIBILITY_TIMEOUT_SECONDS: int = int(os.getenv("INGEST_JOB_VISIBILITY_TIMEOUT_SECONDS", 300))
+    INGEST_JOB_MAX_ATTEMPTS: int = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", 3))
+    INGEST_JOB_RETRY_BACKOFF_SECONDS: int = int(os.getenv("INGEST_JOB_RETRY_BACKOFF_SECONDS", 60))
+    # Page progress is written at most this often per job, and polled this often by the SSE endpoint
+    INGEST_PROGRESS_INTERVAL_SECONDS: float = float(os.getenv("INGEST_PROGRESS_INTERVAL_SECONDS", 1.0))
+    INGEST_PROGRESS_HEARTBEAT_SECONDS: float = float(os.getenv("INGEST_PROGRESS_HEARTBEAT_SECONDS", 15.0))
+
+    # Page-parallel parsing inside one job: processes partitioning page ranges (0 = one per CPU
+    # core; divide by INGEST_WORKER_CONCURRENCY when several jobs share a machine), pages per
+    # range, and pages cleaned / chunked / summarized / uploaded at the same time
+    INGEST_PARTITION_PROCESSES: int = int(os.getenv("INGEST_PARTITION_PROCESSES", 0))
+    INGEST_PAGES_PER_RANGE: int = int(os.getenv("INGEST_PAGES_PER_RANGE", 8))
+    INGEST_PAGE_CONCURRENCY: int = int(os.getenv("INGEST_PAGE_CONCURRENCY", 4))
+    # Memory ceiling of one ingestion job incl. its partition processes (0 = no ceiling)
+    INGEST_MEMORY_LIMIT_MB: int = int(os.getenv("INGEST_MEMORY_LIMIT_MB", 0))
+    # Recycle a partition process after this many page ranges (0 = keep it for the whole job)
+    INGEST_PARTITION_MAX_TASKS_PER_CHILD: int = int(os.getenv("INGEST_PARTITION_MAX_TASKS_PER_CHILD", 0))
+    # Per-page fast path: pages with a usable text layer (enough characters, no tables, images
+    # covering at most the given share of the page) skip the layout model and OCR
+    INGEST_FAST_PATH_ENABLED: bool = os.getenv("INGEST_FAST_PATH_ENABLED", "true").lower() == "true"
+    INGEST_FAST_MIN_CHARS: int = int(os.getenv("INGEST_FAST_MIN_CHARS", 200))
+    INGEST_FAST_MAX_IMAGE_RATIO: float = float(os.getenv("INGEST_FAST_MAX_IMAGE_RATIO", 0.3))
+
+    # Chunk summaries: "batched" (many chunks per json-mode call) or "concurrent" (one call per
+    # chunk); chunks shorter than SUMMARY_MIN_CHARS are embedded without a summary
+    SUMMARY_MODE: str = os.getenv("SUMMARY_MODE", "batched")
+    SUMMARY_BATCH_SIZE: int = int(os.getenv("SUMMARY_BATCH_SIZE", 16))
+    SUMMARY_BATCH_MAX_TOKENS: int = int(os.getenv("SUMMARY_BATCH_MAX_TOKENS", 8000))
+    SUMMARY_CONCURRENCY: int = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+    SUMMARY_MIN_CHARS: int = int(os.getenv("SUMMARY_MIN_CHARS", 200))
+
+    # Semantic chunking: breakpoint percentile, ingestion embedding cache size (entries, in
+    # process), and how chunk vectors are made: "embed" (summary + chunk text is embedded) or
+    # "mean" (mean of the chunk's sentence vectors: about half the embedding calls per page and
+    # no summary calls, but vectors without the summary). "embed" stays the default, see README
+    CHUNK_BREAKPOINT_PERCENTILE: float = float(os.getenv("CHUNK_BREAKPOINT_PERCENTILE", 80))
+    DOCUMENT_EMBEDDING_CACHE_SIZE: int = int(os.getenv("DOCUMENT_EMBEDDING_CACHE_SIZE", 2000))
+    CHUNK_VECTOR_MODE: str = os.getenv("CHUNK_VECTOR_MODE", "embed")
+
+    # Image descriptions: images smaller than this (either side / area in pixels) or thinner than
+    # the aspect ratio (rules, borders) are treated as decoration and never sent to the vision
+    # model; descriptions are shared by exact hash, and within one document by perceptual hash
+    # (max Hamming distance)
+    IMAGE_MIN_SIDE_PX: int = int(os.getenv("IMAGE_MIN_SIDE_PX", 48))
+    IMAGE_MIN_AREA_PX: int = int(os.getenv("IMAGE_MIN_AREA_PX", 100 * 100))
+    IMAGE_MAX_ASPECT_RATIO: float = float(os.getenv("IMAGE_MAX_ASPECT_RATIO", 12.0))
+    IMAGE_PHASH_MAX_DISTANCE: int = int(os.getenv("IMAGE_PHASH_MAX_DISTANCE", 4))
+
+    # Shared OpenAI rate governor (app/core/llm_governor.py): per-model budgets of the key used until
+    # the first response headers arrive (0 = unknown), share of both budgets background calls must
+    # leave free for chat, 429 backoff, completion size assumed when a call sets no max_tokens
+    OPENAI_RPM_LIMIT: int = int(os.getenv("OPENAI_RPM_LIMIT", 0))
+    OPENAI_TPM_LIMIT: int = int(os.getenv("OPENAI_TPM_LIMIT", 0))
+    LLM_INTERACTIVE_RESERVE: float = float(os.getenv("LLM_INTERACTIVE_RESERVE", 0.3))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1.0))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 60.0))
+    LLM_DEFAULT_COMPLETION_TOKENS: int = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", 1000))
+
+    # Page cleaning: "auto" sends only pages failing the local quality score to the LLM,
+    # "llm" sends every page, "heuristic" none
+    CLEANING_MODE: str = os.getenv("CLEANING_MODE", "auto")
+    CLEANING_MAX_GARBAGE_RATIO: float = float(os.getenv("CLEANING_MAX_GARBAGE_RATIO", 0.05))
+    CLEANING_MIN_DICTIONARY_HIT_RATE: float = float(os.getenv("CLEANING_MIN_DICTIONARY_HIT_RATE", 0.5))
+    CLEANING_MAX_BROKEN_HYPHEN_RATIO: float = float(os.getenv("CLEANING_MAX_BROKEN_HYPHEN_RATIO", 0.3))
+
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,289 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core.config import settings
+from app.helpers.tokens import count_tokens
+
+#################################################################################################
+#   Shared OpenAI rate governor with priority lanes
+#   Every request of openaiClient / openaiAsyncClient passes the httpx event hooks below:
+#   - before sending, the request waits until its model's request and token budgets allow it
+#     (tokens estimated with tiktoken: prompt + max_tokens, like OpenAI counts them)
+#   - every response updates the budgets from the x-ratelimit-* headers. Those are the budgets
+#     of the API key, so each process (API, every ingestion worker) sees what all the others
+#     used without talking to them.
+#   - a 429 pauses both lanes with exponential backoff and jitter (at least retry-after), the
+#     background lane twice as long
+#   Lanes: "interactive" (chat) may use the whole budget; "background" (ingestion, memory
+#   folding) only runs while LLM_INTERACTIVE_RESERVE of both budgets is still free, and never
+#   while a chat call of the same process is waiting. The API process defaults to interactive,
+#   the worker pool to background; llm_lane() switches a block of code.
+#################################################################################################
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+# token cost OpenAI assumes for one high detail image part
+IMAGE_TOKEN_ESTIMATE = 765
+
+_lane = ContextVar("llm_lane", default=None)
+
+
+@contextmanager
+def llm_lane(lane: str):
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def _header_number(headers, name: str):
+    # None when missing or not a number (retry-after may also be an http date)
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+#################################################################################################
+#   Helper function to estimate the tokens a request counts against the TPM budget
+#   input: url path, json body, output: (model, tokens)
+#################################################################################################
+def estimate_request_tokens(path: str, body: dict):
+    model = body.get("model")
+    if path.endswith("/embeddings"):
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return model, sum(count_tokens(text) if isinstance(text, str) else len(text) for text in inputs)
+
+    if path.endswith("/chat/completions"):
+        tokens = 0
+        for message in body.get("messages") or []:
+            tokens += 4
+            content = message.get("content")
+            if isinstance(content, str):
+                tokens += count_tokens(content)
+            elif isinstance(content, list):
+                for part in content:
+                    if part.get("type") == "text":
+                        tokens += count_tokens(part.get("text", ""))
+                    else:
+                        tokens += IMAGE_TOKEN_ESTIMATE
+        return model, tokens + (body.get("max_tokens") or settings.LLM_DEFAULT_COMPLETION_TOKENS)
+
+    return model, 0
+
+
+#################################################################################################
+#   One per-minute budget (requests or tokens) of one model
+#   Refills linearly; reset to the server's numbers whenever a response carries them.
+#   capacity None: limit unknown (no response seen, no configured limit), nothing is held back
+#################################################################################################
+class _Budget:
+    def __init__(self, capacity: int):
+        self.capacity = capacity or None
+        self.level = float(capacity) if capacity else None
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        if self.capacity is None:
+            return
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def observe(self, limit: int, remaining: int, now: float):
+        self.capacity = limit
+        self.level = float(remaining)
+        self.updated = now
+
+    def wait_for(self, amount: float, reserve: float) -> float:
+        if self.capacity is None:
+            return 0
+        missing = min(amount, self.capacity) + reserve * self.capacity - self.level
+        return max(missing, 0) / (self.capacity / 60)
+
+    def take(self, amount: float):
+        if self.capacity is not None:
+            self.level -= amount
+
+
+class LLMGovernor:
+    def __init__(self):
+        self.default_lane = INTERACTIVE
+        self._lock = threading.Lock()
+        self._budgets = {}
+        self._request_models = weakref.WeakKeyDictionary()
+        self._paused_until = {lane: 0.0 for lane in LANES}
+        self._consecutive_rate_limits = 0
+        self._interactive_waiting = 0
+        self._waits = {lane: deque(maxlen=1000) for lane in LANES}
+        self._counters = {"requests": 0, "throttled": 0, "rate_limited": 0}
+
+    def current_lane(self) -> str:
+        return _lane.get() or self.default_lane
+
+    def _budgets_for(self, model: str):
+        if model not in self._budgets:
+            self._budgets[model] = (_Budget(settings.OPENAI_RPM_LIMIT), _Budget(settings.OPENAI_TPM_LIMIT))
+        return self._budgets[model]
+
+    # returns 0 when the request may go (its cost is taken), otherwise the seconds to wait
+    def _try_admit(self, lane: str, model: str, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until[lane]:
+                return self._paused_until[lane] - now
+            if lane == BACKGROUND and self._interactive_waiting:
+                return 0.05
+
+            requests, token_budget = self._budgets_for(model)
+            requests.refill(now)
+            token_budget.refill(now)
+            reserve = settings.LLM_INTERACTIVE_RESERVE if lane == BACKGROUND else 0
+            wait = max(requests.wait_for(1, reserve), token_budget.wait_for(tokens, reserve))
+            if wait > 0:
+                return wait
+            requests.take(1)
+            token_budget.take(tokens)
+            return 0
+
+    def _set_waiting(self, lane: str, delta: int):
+        if lane == INTERACTIVE:
+            with self._lock:
+                self._interactive_waiting += delta
+
+    def _record_wait(self, lane: str, seconds: float):
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["throttled"] += int(seconds > 0.001)
+            self._waits[lane].append(seconds)
+
+    def acquire(self, model: str, tokens: int):
+        lane = self.current_lane()
+        started = time.monotonic()
+        waiting = False
+        try:
+            while (wait := self._try_admit(lane, model, tokens)) > 0:
+                if not waiting:
+                    self._set_waiting(lane, 1)
+                    waiting = True
+                time.sleep(min(wait, 1.0))
+        finally:
+            if waiting:
+                self._set_waiting(lane, -1)
+        self._record_wait(lane, time.monotonic() - started)
+
+    async def acquire_async(self, model: str, tokens: int):
+        lane = self.current_lane()
+        started = time.monotonic()
+        waiting = False
+        try:
+            while (wait := self._try_admit(lane, model, tokens)) > 0:
+                if not waiting:
+                    self._set_waiting(lane, 1)
+                    waiting = True
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            if waiting:
+                self._set_waiting(lane, -1)
+        self._record_wait(lane, time.monotonic() - started)
+
+    def observe_response(self, model: str, status_code: int, headers):
+        with self._lock:
+            now = time.monotonic()
+            if status_code == 429:
+                self._consecutive_rate_limits += 1
+                self._counters["rate_limited"] += 1
+                backoff = min(
+                    settings.LLM_BACKOFF_MAX_SECONDS,
+                    settings.LLM_BACKOFF_BASE_SECONDS * 2 ** (self._consecutive_rate_limits - 1),
+                )
+                retry_after_ms = _header_number(headers, "retry-after-ms")
+                retry_after = retry_after_ms / 1000 if retry_after_ms is not None else (_header_number(headers, "retry-after") or 0)
+                delay = max(retry_after, random.uniform(backoff / 2, backoff))
+                self._paused_until[INTERACTIVE] = max(self._paused_until[INTERACTIVE], now + delay)
+                self._paused_until[BACKGROUND] = max(self._paused_until[BACKGROUND], now + 2 * delay)
+            elif status_code < 400:
+                self._consecutive_rate_limits = 0
+
+            if model is None:
+                return
+            for budget, kind in zip(self._budgets_for(model), ("requests", "tokens")):
+                limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+                if limit and remaining is not None:
+                    budget.observe(int(limit), int(remaining), now)
+
+    #############################################################################################
+    #   httpx event hooks (openai.DefaultHttpxClient / DefaultAsyncHttpxClient)
+    #   A request whose body cannot be read (not json) only counts as a request.
+    #############################################################################################
+    def _estimate(self, request):
+        try:
+            model, tokens = estimate_request_tokens(request.url.path, json.loads(request.content or b"{}"))
+        except Exception:
+            model, tokens = None, 0
+        self._request_models[request] = model
+        return model, tokens
+
+    def _on_request(self, request):
+        self.acquire(*self._estimate(request))
+
+    async def _on_request_async(self, request):
+        await self.acquire_async(*self._estimate(request))
+
+    def _on_response(self, response):
+        self.observe_response(self._request_models.pop(response.request, None), response.status_code, response.headers)
+
+    async def _on_response_async(self, response):
+        self._on_response(response)
+
+    def event_hooks(self) -> dict:
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    def async_event_hooks(self) -> dict:
+        return {"request": [self._on_request_async], "response": [self._on_response_async]}
+
+    #############################################################################################
+    #   Counters of this process (admission wait per lane, budgets per model)
+    #############################################################################################
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            waits = {}
+            for lane, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[lane] = {
+                    "samples": len(ordered),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                    "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 1) if ordered else None,
+                }
+            budgets = {}
+            for model, (requests, token_budget) in self._budgets.items():
+                requests.refill(now)
+                token_budget.refill(now)
+                budgets[model] = {
+                    "requests_limit": requests.capacity,
+                    "requests_remaining": round(requests.level) if requests.capacity else None,
+                    "tokens_limit": token_budget.capacity,
+                    "tokens_remaining": round(token_budget.level) if token_budget.capacity else None,
+                }
+            return {
+                "default_lane": self.default_lane,
+                **self._counters,
+                "paused_seconds": {lane: round(max(until - now, 0), 2) for lane, until in self._paused_until.items()},
+                "wait": waits,
+                "budgets": budgets,
+            }
+
+
+llmGovernor = LLMGovernor()
@@ -1,4 +1,14 @@
 import openai
 from app.core.config import settings
+from app.core.llm_governor import llmGovernor
 
-openaiClient = openai.Client(api_key = settings.OPENAI_API_KEY)
\ No newline at end of file
+# Every request passes the shared rate governor (budgets, chat before ingestion, 429 backoff)
+openaiHttpClient = openai.DefaultHttpxClient(event_hooks=llmGovernor.event_hooks())
+
+openaiClient = openai.Client(api_key = settings.OPENAI_API_KEY, http_client = openaiHttpClient)
+
+# Used on the request path so LLM calls never block the event loop
+openaiAsyncClient = openai.AsyncClient(
+    api_key = settings.OPENAI_API_KEY,
+    http_client = openai.DefaultAsyncHttpxClient(event_hooks=llmGovernor.async_event_hooks())
+)
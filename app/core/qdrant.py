@@ -2,4 +2,7 @@ import qdrant_client
 from qdrant_client import QdrantClient
 from app.core.config import settings
 
-qdrantClient = qdrant_client.QdrantClient(settings.QDRANT_HOST, api_key = settings.QDRANT_API_KEY)
\ No newline at end of file
+qdrantClient = qdrant_client.QdrantClient(settings.QDRANT_HOST, api_key = settings.QDRANT_API_KEY)
+
+# Used on the request path so vector searches never block the event loop
+qdrantAsyncClient = qdrant_client.AsyncQdrantClient(settings.QDRANT_HOST, api_key = settings.QDRANT_API_KEY)
@@ -5,3 +5,8 @@ from app.db.models.users import User
 from app.db.models.files import File
 from app.db.models.chats import Chat
 from app.db.models.messages import Message
+from app.db.models.embedding_cache import EmbeddingCache
+from app.db.models.ingestion_jobs import IngestionJob
+from app.db.models.image_descriptions import ImageDescription
+from app.db.models.ingestion_checkpoints import IngestionCheckpoint
+from app.db.models.answer_cache_generations import AnswerCacheGeneration
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Integer, TIMESTAMP
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class AnswerCacheGeneration(Base):
+    __tablename__ = 'answer_cache_generations'
+
+    # knowledge collection the semantic answer cache belongs to
+    collection_name = Column(String, primary_key=True)
+    # bumped on every invalidation, cached answers of older generations are ignored
+    generation = Column(Integer, nullable=False, server_default='0')
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -12,6 +12,10 @@ class Chat(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     first_message = Column(String, nullable=False)
     
+    # rolling conversation memory: summary of every message up to summarized_until
+    summary = Column(String, nullable=True)
+    summarized_until = Column(DateTime, nullable=True)
+    
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
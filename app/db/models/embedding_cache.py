@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, LargeBinary, TIMESTAMP
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class EmbeddingCache(Base):
+    __tablename__ = 'embedding_cache'
+
+    # sha256 of model name + normalized text
+    cache_key = Column(String, primary_key=True)
+    model = Column(String, nullable=False)
+    # float32 little-endian bytes
+    vector = Column(LargeBinary, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
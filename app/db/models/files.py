@@ -1,5 +1,6 @@
 import uuid
 from sqlalchemy import Column, String, ForeignKey, TIMESTAMP, UUID
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
@@ -13,5 +14,9 @@ class File(Base):
     file_url = Column(String, nullable=False)
     status = Column(String, nullable=True, default='parsing...')
     uploaded_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    # ingestion statistics, e.g. {"pages": 120, "fast_pages": 112, "hi_res_pages": 8, "parse_seconds": 41.3}
+    parse_stats = Column(JSONB, nullable=True)
+    # sha256 of the uploaded PDF, identical uploads reuse the vectors of the first one
+    content_hash = Column(String, nullable=True, index=True)
 
     uploader = relationship('User', back_populates='files')
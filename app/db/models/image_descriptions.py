@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Text, Integer, TIMESTAMP
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class ImageDescription(Base):
+    __tablename__ = 'image_descriptions'
+
+    # sha256 of the decoded image bytes
+    image_hash = Column(String, primary_key=True)
+    # 64-bit difference hash (hex) of the image, equal for re-encoded / rescaled copies
+    # (recorded only, lookups across documents use image_hash)
+    perceptual_hash = Column(String, nullable=False, index=True)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    description = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, TIMESTAMP, UUID
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class IngestionCheckpoint(Base):
+    __tablename__ = 'ingestion_checkpoints'
+
+    # one row per finished page of a file that is being (or failed being) ingested
+    file_id = Column(UUID(as_uuid=True), ForeignKey('fileinfo.file_id', ondelete='CASCADE'), primary_key=True)
+    page_no = Column(Integer, primary_key=True)
+    page_hash = Column(String, nullable=True)
+    # ids of the qdrant points written for the page
+    point_ids = Column(JSONB, nullable=False, default=list)
+    strategy = Column(String, nullable=True)
+    # cleaning decision and scores of the page, None when the page reused existing points
+    cleaning = Column(JSONB, nullable=True)
+    completed_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
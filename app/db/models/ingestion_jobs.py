@@ -0,0 +1,35 @@
+import uuid
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, TIMESTAMP, UUID, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class IngestionJob(Base):
+    __tablename__ = 'ingestion_jobs'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    file_id = Column(UUID(as_uuid=True), ForeignKey('fileinfo.file_id', ondelete='CASCADE'), nullable=False)
+    kind = Column(String, nullable=False, default='process_pdf')
+    # arguments of the job handler (file_url, file_name, ...)
+    payload = Column(JSONB, nullable=False, default=dict)
+
+    # queued -> running -> completed | failed (running jobs whose lease expired go back to queued)
+    status = Column(String, nullable=False, default='queued')
+    # higher runs first
+    priority = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text, nullable=True)
+
+    # not claimable before this time (retry backoff)
+    available_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    # visibility timeout: the worker holding the job must renew the lease before it expires
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_ingestion_jobs_claim', 'status', 'priority', 'available_at'),
+    )
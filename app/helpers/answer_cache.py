@@ -0,0 +1,143 @@
+import uuid
+
+from qdrant_client.http.models import VectorParams, Distance, Filter, FieldCondition, MatchValue, PayloadSchemaType
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.core.qdrant import qdrantClient, qdrantAsyncClient
+from app.db.models.answer_cache_generations import AnswerCacheGeneration
+from app.db.session import SessionLocal, AsyncSessionLocal
+from app.helpers.embedding_cache import normalize_query
+
+#################################################################################################
+#   Semantic answer cache for first messages
+#   Cached questions live in a sibling qdrant collection "<collection>_answer_cache" so every
+#   worker shares them. A hit is any cached question within SEMANTIC_CACHE_MAX_DISTANCE
+#   (cosine) of the new one. The whole cache is dropped whenever the knowledge collection changes.
+#   Every entry carries the cache generation (table answer_cache_generations) read before its
+#   answer was retrieved. Invalidation bumps the generation first, so an answer built from the
+#   old collection and stored after the invalidation is never served.
+#################################################################################################
+
+def answer_cache_collection_name(collection_name: str) -> str:
+    return f"{collection_name}_answer_cache"
+
+
+#################################################################################################
+#   Helper function to read the current cache generation of a knowledge collection
+#   input: knowledge collection, output: generation, None when it cannot be read (cache unused)
+#################################################################################################
+async def get_answer_cache_generation(collection_name: str):
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    try:
+        async with AsyncSessionLocal() as db:
+            generation = await db.scalar(
+                select(AnswerCacheGeneration.generation).where(AnswerCacheGeneration.collection_name == collection_name)
+            )
+        return generation or 0
+    except Exception as e:
+        print(f"Error reading semantic cache generation: {e}")
+        return None
+
+
+#################################################################################################
+#   Helper function to look up a cached answer
+#   input: knowledge collection, question embedding, cache generation,
+#   output: {"answer", "knowledge"} or None
+#################################################################################################
+async def lookup_cached_answer(collection_name: str, embedding, generation: int):
+    if not settings.SEMANTIC_CACHE_ENABLED or generation is None:
+        return None
+    try:
+        results = await qdrantAsyncClient.search(
+            collection_name = answer_cache_collection_name(collection_name),
+            query_vector = ("question", embedding),
+            query_filter=Filter(must=[FieldCondition(key="generation", match=MatchValue(value=generation))]),
+            limit=1,
+            score_threshold=1 - settings.SEMANTIC_CACHE_MAX_DISTANCE,
+            with_payload=True,
+            with_vectors=False,
+        )
+    except Exception as e:
+        # Usually the cache collection does not exist yet
+        return None
+
+    if not results:
+        return None
+    return results[0].payload
+
+
+#################################################################################################
+#   Helper function to store an answer for a question
+#   input: knowledge collection, question, question embedding, answer, knowledge list,
+#   cache generation read before the knowledge was retrieved
+#################################################################################################
+async def store_cached_answer(collection_name: str, question: str, embedding, answer: str, knowledge, generation: int):
+    if not settings.SEMANTIC_CACHE_ENABLED or generation is None:
+        return
+    cache_collection = answer_cache_collection_name(collection_name)
+    try:
+        if not await qdrantAsyncClient.collection_exists(cache_collection):
+            try:
+                await qdrantAsyncClient.create_collection(
+                    cache_collection,
+                    vectors_config={
+                        "question": VectorParams(
+                            size=len(embedding),
+                            distance=Distance.COSINE
+                        ),
+                    },
+                )
+            except Exception:
+                # "already exists": a concurrent first store created it, use that one
+                if not await qdrantAsyncClient.collection_exists(cache_collection):
+                    raise
+            # creating an index that already exists is a no-op
+            await qdrantAsyncClient.create_payload_index(cache_collection, "generation", field_schema=PayloadSchemaType.INTEGER)
+        await qdrantAsyncClient.upsert(
+            cache_collection,
+            points=[
+                {
+                    "id": str(uuid.uuid5(uuid.NAMESPACE_URL, normalize_query(question))),
+                    "vector": {
+                        "question": embedding
+                    },
+                    "payload": {
+                        "question": question,
+                        "answer": answer,
+                        "knowledge": knowledge,
+                        "generation": generation
+                    }
+                }
+            ],
+            wait=False
+        )
+    except Exception as e:
+        print(f"Error storing answer in semantic cache: {e}")
+
+
+#################################################################################################
+#   Helper function to drop every cached answer of a knowledge collection
+#   Called whenever ingestion or file deletion changes the collection. Bumping the generation is
+#   what invalidates (answers still being generated will be stored with the old one); dropping
+#   the collection only frees the space.
+#################################################################################################
+def invalidate_answer_cache(collection_name: str):
+    statement = insert(AnswerCacheGeneration).values(collection_name=collection_name, generation=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[AnswerCacheGeneration.collection_name],
+        set_={"generation": AnswerCacheGeneration.generation + 1, "updated_at": func.now()},
+    )
+    try:
+        with SessionLocal() as db:
+            db.execute(statement)
+            db.commit()
+    except Exception as e:
+        print(f"Error bumping semantic cache generation: {e}")
+    try:
+        qdrantClient.delete_collection(answer_cache_collection_name(collection_name))
+    except Exception as e:
+        print(f"Error invalidating semantic answer cache: {e}")
@@ -0,0 +1,99 @@
+import re
+
+from app.core.config import settings
+from app.helpers.tokens import count_tokens, truncate_to_tokens
+from app.helpers.qdrant_functions import FusedPoints
+
+#################################################################################################
+#   Knowledge context assembly
+#   Turns the retrieved points into the knowledge text sent to create_chat_completion:
+#   1. drop hits scoring far below the best one, for cosine scores only: an RRF score says how
+#      many result lists found a hit, not how relevant it is (a hit found only by the sparse
+#      search or only by one rewrite scores about half of one found by all), so fused results
+#      (FusedPoints) keep every candidate
+#   2. pick chunks by maximal marginal relevance, dropping near-duplicates of picked chunks
+#   3. stop at CONTEXT_MAX_CHUNKS or when CONTEXT_TOKEN_BUDGET is used up
+#   4. print the picked chunks grouped by source document, in page order
+#################################################################################################
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _shingles(text: str, size: int = 3):
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _page_sort_key(payload):
+    try:
+        return int(payload.get("page_no", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_knowledge_context(points) -> str:
+    groups = {}
+    for point in points:
+        payload = point.payload
+        groups.setdefault(payload.get("file_id"), []).append(payload)
+
+    sections = []
+    for payloads in groups.values():
+        lines = [f"[Source: {payloads[0].get('file_name', 'unknown')}]"]
+        for payload in sorted(payloads, key=_page_sort_key):
+            lines.append(f"(page {payload.get('page_no', '?')}) {payload.get('content', '').strip()}")
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+#################################################################################################
+#   Helper function to build the knowledge context for one chat turn
+#   input: ranked qdrant points, output: (context string, selected points)
+#################################################################################################
+def assemble_knowledge_context(points, max_tokens: int = None):
+    max_tokens = settings.CONTEXT_TOKEN_BUDGET if max_tokens is None else max_tokens
+    fused = isinstance(points, FusedPoints)
+    points = [point for point in points if point.payload and point.payload.get("content")]
+    if not points:
+        return "", []
+
+    top_score = max(point.score for point in points) or 1.0
+    min_relative_score = 0.0 if fused else settings.CONTEXT_MIN_RELATIVE_SCORE
+    candidates = [
+        point for point in points
+        if point.score >= top_score * min_relative_score
+    ]
+    shingles = {point.id: _shingles(point.payload["content"]) for point in candidates}
+
+    selected = []
+    used_tokens = 0
+    while candidates and len(selected) < settings.CONTEXT_MAX_CHUNKS:
+        best_point, best_value = None, None
+        for point in candidates:
+            redundancy = max((_similarity(shingles[point.id], shingles[other.id]) for other in selected), default=0.0)
+            if redundancy >= settings.CONTEXT_DUPLICATE_THRESHOLD:
+                continue
+            relevance = point.score / top_score
+            value = settings.CONTEXT_MMR_LAMBDA * relevance - (1 - settings.CONTEXT_MMR_LAMBDA) * redundancy
+            if best_value is None or value > best_value:
+                best_point, best_value = point, value
+        if best_point is None:
+            break
+
+        candidates.remove(best_point)
+        chunk_tokens = count_tokens(best_point.payload["content"])
+        if selected and used_tokens + chunk_tokens > max_tokens:
+            continue
+        selected.append(best_point)
+        used_tokens += chunk_tokens
+
+    # Headers and page markers are not part of the per-chunk count; the final cut keeps the budget hard
+    return truncate_to_tokens(format_knowledge_context(selected), max_tokens), selected
@@ -0,0 +1,117 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.llm_governor import llm_lane, BACKGROUND
+from app.core.openai import openaiAsyncClient
+from app.db.models.chats import Chat as ChatModel
+from app.db.models.messages import Message as MessageModel
+from app.db.session import AsyncSessionLocal
+from app.helpers.tokens import count_tokens
+
+#################################################################################################
+#   Conversation memory for update_chat
+#   A chat is remembered as chats.summary (everything up to chats.summarized_until) plus the
+#   messages after that cursor. Once the unsummarized window grows past twice the configured
+#   size, its oldest messages are folded into the summary, so each turn only ever reads and
+#   sends a bounded amount of history.
+#################################################################################################
+
+def _format_message(message) -> str:
+    sender = "assistant" if message.sender == "assistant" else "human"
+    return f"{sender}: {message.content}\n\n"
+
+
+#################################################################################################
+#   Helper function to load the messages that are not yet part of the summary
+#   input: session, chat row, output: messages ordered by created_at
+#################################################################################################
+async def load_memory_messages(db: AsyncSession, db_chat):
+    statement = select(MessageModel).where(MessageModel.chat_id == db_chat.id)
+    if db_chat.summarized_until is not None:
+        statement = statement.where(MessageModel.created_at > db_chat.summarized_until)
+    statement = statement.order_by(MessageModel.created_at)
+    return (await db.scalars(statement)).all()
+
+
+#################################################################################################
+#   Helper function to build the conversation text sent to the LLM
+#   input: stored summary, unsummarized messages, output: string within MEMORY_TOKEN_BUDGET
+#   The newest messages win; older ones that do not fit are left to the summary.
+#################################################################################################
+def build_conversation_memory(summary, messages) -> str:
+    budget = settings.MEMORY_TOKEN_BUDGET
+    header = ""
+    if summary:
+        header = f"Summary of the earlier conversation:\n{summary}\n\n"
+        budget -= count_tokens(header)
+
+    recent = []
+    for message in reversed(messages[-settings.MEMORY_RECENT_MESSAGES:]):
+        line = _format_message(message)
+        tokens = count_tokens(line)
+        if recent and tokens > budget:
+            break
+        recent.append(line)
+        budget -= tokens
+
+    return header + "Conversation:\n\n" + "".join(reversed(recent))
+
+
+async def _summarize(previous_summary, messages) -> str:
+    conversation = "".join(_format_message(message) for message in messages)
+    response = await openaiAsyncClient.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content":
+                """
+                You maintain the running memory of a banking assistant conversation.
+                Merge the existing summary with the new messages into one concise summary.
+                Keep every fact, figure, product name and open question the user cares about.
+                Return only the summary.
+                """
+            },
+            {"role": "user", "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{conversation}"}
+        ],
+        temperature=0,
+        max_tokens=settings.MEMORY_SUMMARY_MAX_TOKENS
+    )
+    return response.choices[0].message.content.strip()
+
+
+#################################################################################################
+#   Folds the oldest unsummarized messages of a chat into its summary when the window is full
+#   input: chat id. Runs after the answer was sent and opens its own session.
+#   The cursor update is conditional, so two concurrent folds never overwrite each other.
+#   Nobody waits for the summary, so its LLM call takes the background lane.
+#################################################################################################
+async def fold_conversation_memory(chat_id):
+    try:
+        async with AsyncSessionLocal() as db:
+            db_chat = await db.get(ChatModel, chat_id)
+            if not db_chat:
+                return
+
+            messages = await load_memory_messages(db, db_chat)
+            keep = settings.MEMORY_RECENT_MESSAGES
+            window_tokens = sum(count_tokens(_format_message(message)) for message in messages)
+            if len(messages) <= 2 * keep and window_tokens <= settings.MEMORY_TOKEN_BUDGET:
+                return
+
+            overflow = messages[:-keep] if len(messages) > keep else messages[:1]
+            with llm_lane(BACKGROUND):
+                new_summary = await _summarize(db_chat.summary, overflow)
+
+            await db.execute(
+                update(ChatModel)
+                .where(
+                    ChatModel.id == chat_id,
+                    ChatModel.summarized_until.is_not_distinct_from(db_chat.summarized_until)
+                )
+                .values(summary=new_summary, summarized_until=overflow[-1].created_at)
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Error folding conversation memory: {e}")
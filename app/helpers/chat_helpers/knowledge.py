@@ -0,0 +1,56 @@
+from app.core.qdrant import qdrantAsyncClient
+
+#################################################################################################
+#   Message knowledge
+#   messages.knowledge stores compact references ({"id": point id, "score": score}) instead of
+#   copies of the chunk payloads; the chunk text stays in qdrant and is resolved on demand.
+#   Rows written before this change hold full payloads without an "id"; they are passed through.
+#################################################################################################
+
+def to_knowledge_references(points):
+    return [{"id": point.id, "score": point.score} for point in points]
+
+
+def to_knowledge_entries(points):
+    return [{"id": point.id, "score": point.score, **point.payload} for point in points]
+
+
+def _is_reference(entry) -> bool:
+    return isinstance(entry, dict) and "id" in entry and "content" not in entry
+
+
+#################################################################################################
+#   Helper function to resolve the references of many messages with ONE qdrant call
+#   input: collection, list of knowledge lists, output: list of knowledge entry lists
+#   Points that no longer exist are returned as their bare reference.
+#################################################################################################
+async def resolve_knowledge_references(collection_name: str, knowledge_lists):
+    point_ids = list({
+        entry["id"]
+        for knowledge in knowledge_lists if knowledge
+        for entry in knowledge if _is_reference(entry)
+    })
+
+    payloads = {}
+    if point_ids:
+        records = await qdrantAsyncClient.retrieve(
+            collection_name=collection_name,
+            ids=point_ids,
+            with_payload=True,
+            with_vectors=False,
+        )
+        payloads = {str(record.id): record.payload for record in records}
+
+    resolved = []
+    for knowledge in knowledge_lists:
+        if knowledge is None:
+            resolved.append(None)
+            continue
+        entries = []
+        for entry in knowledge:
+            if _is_reference(entry):
+                entries.append({**entry, **payloads.get(str(entry["id"]), {})})
+            else:
+                entries.append(entry)
+        resolved.append(entries)
+    return resolved
@@ -0,0 +1,87 @@
+import asyncio
+import re
+
+from app.core.config import settings
+from app.helpers.qdrant_functions import search_in_qdrant_async, FusedPoints
+from app.helpers.chat_helpers.standardize_prompt import standardize_prompt_for_RAG_async, generate_rewrites_for_RAG_async
+
+# Words that usually point back to an earlier turn ("what about its fee?")
+CONTEXT_DEPENDENT_WORDS = {
+    "it", "its", "it's", "this", "that", "these", "those", "they", "them", "their",
+    "he", "she", "him", "her", "above", "previous", "same", "former", "latter",
+    "also", "else", "again",
+}
+CONTEXT_DEPENDENT_OPENINGS = ("and ", "but ", "so ", "or ", "what about", "how about", "then ", "why not")
+MIN_SELF_CONTAINED_WORDS = 5
+
+
+#################################################################################################
+#   Cheap heuristic: can this message be searched without the rest of the conversation?
+#   input: last user message, output: bool
+#################################################################################################
+def is_self_contained(message: str) -> bool:
+    text = message.strip().lower()
+    words = re.findall(r"[a-z']+", text)
+    if len(words) < MIN_SELF_CONTAINED_WORDS:
+        return False
+    if text.startswith(CONTEXT_DEPENDENT_OPENINGS):
+        return False
+    return not any(word in CONTEXT_DEPENDENT_WORDS for word in words)
+
+
+#################################################################################################
+#   Reciprocal rank fusion of several ranked result lists
+#   input: lists of qdrant ScoredPoints, output: one list ranked by sum(1 / (k + rank))
+#################################################################################################
+def reciprocal_rank_fusion(result_lists, limit: int, k: int = None):
+    k = settings.RETRIEVAL_RRF_K if k is None else k
+    fused_scores = {}
+    points = {}
+    for results in result_lists:
+        for rank, point in enumerate(results, start=1):
+            fused_scores[point.id] = fused_scores.get(point.id, 0.0) + 1.0 / (k + rank)
+            points.setdefault(point.id, point)
+
+    ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:limit]
+    return FusedPoints(points[point_id].model_copy(update={"score": fused_scores[point_id]}) for point_id in ranked_ids)
+
+
+async def _search_rewrites(collection_name, chat_history, limit):
+    if settings.RETRIEVAL_REWRITES > 1:
+        rewrites = await generate_rewrites_for_RAG_async(chat_history, settings.RETRIEVAL_REWRITES)
+    else:
+        rewrites = [await standardize_prompt_for_RAG_async(chat_history)]
+    return await asyncio.gather(*(search_in_qdrant_async(collection_name, rewrite, limit) for rewrite in rewrites))
+
+
+#################################################################################################
+#   Retrieve the knowledge for a chat turn
+#   input: collection, last user message, conversation (None for a first message), limit
+#   output: list of qdrant ScoredPoints
+#   serial:   rewrite the conversation into a search prompt, then search (one extra round trip)
+#   parallel: search the raw message while the rewrites are generated and searched, then fuse.
+#             Self-contained messages skip the rewrite altogether.
+#################################################################################################
+async def retrieve_knowledge(collection_name: str, query: str, chat_history: str = None, limit: int = 10):
+    if chat_history is None:
+        return await search_in_qdrant_async(collection_name, query, limit)
+
+    if settings.RETRIEVAL_MODE == "serial":
+        standardized_prompt = await standardize_prompt_for_RAG_async(chat_history)
+        return await search_in_qdrant_async(collection_name, standardized_prompt, limit)
+
+    if is_self_contained(query):
+        return await search_in_qdrant_async(collection_name, query, limit)
+
+    raw_results, rewrite_results = await asyncio.gather(
+        search_in_qdrant_async(collection_name, query, limit),
+        _search_rewrites(collection_name, chat_history, limit),
+        return_exceptions=True,
+    )
+    if isinstance(raw_results, BaseException):
+        raise raw_results
+    if isinstance(rewrite_results, BaseException):
+        print(f"Query rewrite failed, using the raw message only: {rewrite_results}")
+        return raw_results
+
+    return reciprocal_rank_fusion([raw_results, *rewrite_results], limit)
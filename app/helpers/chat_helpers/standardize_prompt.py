@@ -1,33 +1,68 @@
-from app.core.openai import openaiClient
+from app.core.openai import openaiClient, openaiAsyncClient
 from app.helpers.qdrant_functions import search_in_qdrant
 from fastapi import  HTTPException
 from app.core.config import settings
 
-def standardize_prompt_for_RAG(conversation_history):
+def build_standardize_prompt_messages(conversation_history):
     
     prompt = f"{conversation_history}\n"
     
+    return [
+        {
+            "role": "system", 
+            "content": 
+            f"""
+            You are a agent who helps people get banking information.
+            You represent the bank {settings.BANK_NAME} in Bangladesh
+            Your name is 'BankGPT'. You were created by 'BUET Incubator'.
+            You have access to a vector database that has knowledge all about {settings.BANK_NAME} bank's information.
+            You will be given an entire conversation history. You need to standardize the user prompt to properly search into the vector database.
+            You MUST return only the standardized prompt and nothing else
+            """
+            },
+        {"role": "user", "content": prompt}
+    ]
+
+def standardize_prompt_for_RAG(conversation_history):
+    
     try:
         response = openaiClient.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": 
-                    f"""
-                    You are a agent who helps people get banking information.
-                    You represent the bank {settings.BANK_NAME} in Bangladesh
-                    Your name is 'BankGPT'. You were created by 'BUET Incubator'.
-                    You have access to a vector database that has knowledge all about {settings.BANK_NAME} bank's information.
-                    You will be given an entire conversation history. You need to standardize the user prompt to properly search into the vector database.
-                    You MUST return only the standardized prompt and nothing else
-                    """
-                    },
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_standardize_prompt_messages(conversation_history),
+            temperature=0,
+            max_tokens=200
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+
+async def standardize_prompt_for_RAG_async(conversation_history):
+    
+    try:
+        response = await openaiAsyncClient.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_standardize_prompt_messages(conversation_history),
             temperature=0,
             max_tokens=200
         )
         return response.choices[0].message.content
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+
+async def generate_rewrites_for_RAG_async(conversation_history, count):
+    
+    messages = build_standardize_prompt_messages(conversation_history)
+    messages[0]["content"] += f"""
+            Write {count} different standardized prompts, each one on its own line, without numbering.
+            """
+    try:
+        response = await openaiAsyncClient.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0,
+            max_tokens=200 * count
+        )
+        rewrites = [line.strip() for line in response.choices[0].message.content.splitlines() if line.strip()]
+        return rewrites[:count]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
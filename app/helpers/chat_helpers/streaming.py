@@ -0,0 +1,8 @@
+import json
+
+#################################################################################################
+#   Helper function to format one server-sent event
+#   input: event name and json-serializable data, output: SSE frame string
+#################################################################################################
+def format_sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,182 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.models.embedding_cache import EmbeddingCache as EmbeddingCacheModel
+from app.db.session import AsyncSessionLocal
+from app.helpers.embedding_generate import EMBEDDING_MODEL, create_embedding_async, create_embeddings
+
+#################################################################################################
+#   Query embedding cache
+#   tier 1: in-process LRU with size and TTL bounds
+#   tier 2: optional postgres table shared by all gunicorn workers (EMBEDDING_CACHE_SHARED)
+#   Vectors are kept as float32 bytes (12 KB for 3072 dims instead of ~100 KB as a python list)
+#################################################################################################
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.lower().split())
+
+
+def make_cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+def vector_to_bytes(vector) -> bytes:
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def bytes_to_vector(data: bytes) -> list:
+    return np.frombuffer(data, dtype="<f4").tolist()
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+_local_cache = LRUCache(settings.EMBEDDING_CACHE_SIZE, settings.EMBEDDING_CACHE_TTL_SECONDS)
+_document_cache = LRUCache(settings.DOCUMENT_EMBEDDING_CACHE_SIZE, settings.EMBEDDING_CACHE_TTL_SECONDS)
+_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+
+async def _get_shared(key: str):
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.EMBEDDING_CACHE_TTL_SECONDS)
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(
+            select(EmbeddingCacheModel.vector)
+            .where(EmbeddingCacheModel.cache_key == key, EmbeddingCacheModel.created_at > cutoff)
+        )
+
+
+async def _set_shared(key: str, model: str, data: bytes):
+    statement = insert(EmbeddingCacheModel).values(cache_key=key, model=model, vector=data)
+    statement = statement.on_conflict_do_update(
+        index_elements=[EmbeddingCacheModel.cache_key],
+        set_={"vector": statement.excluded.vector, "created_at": statement.excluded.created_at},
+    )
+    async with AsyncSessionLocal() as db:
+        await db.execute(statement)
+        await db.commit()
+
+
+#################################################################################################
+#   Cached replacement for create_embedding_async on the query path
+#   input: query text, output: embedding as a list of floats
+#   A failing shared tier only costs a cache miss, never the request.
+#################################################################################################
+async def get_query_embedding_async(text: str, model: str = EMBEDDING_MODEL):
+    model = f"{model}@{settings.EMBEDDING_DIMENSIONS}"
+    key = make_cache_key(text, model)
+
+    data = _local_cache.get(key)
+    if data is not None:
+        _stats["local_hits"] += 1
+        return bytes_to_vector(data)
+
+    if settings.EMBEDDING_CACHE_SHARED:
+        try:
+            data = await _get_shared(key)
+        except Exception as e:
+            print(f"Embedding cache lookup failed: {e}")
+        if data is not None:
+            _stats["shared_hits"] += 1
+            _local_cache.set(key, data)
+            return bytes_to_vector(data)
+
+    _stats["misses"] += 1
+    embedding = await create_embedding_async(text)
+    data = vector_to_bytes(embedding)
+    _local_cache.set(key, data)
+
+    if settings.EMBEDDING_CACHE_SHARED:
+        try:
+            await _set_shared(key, model, data)
+        except Exception as e:
+            print(f"Embedding cache write failed: {e}")
+
+    return embedding
+
+
+def embedding_cache_stats() -> dict:
+    lookups = _stats["local_hits"] + _stats["shared_hits"] + _stats["misses"]
+    hits = _stats["local_hits"] + _stats["shared_hits"]
+    return {
+        **_stats,
+        "lookups": lookups,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "local_size": len(_local_cache),
+        "local_max_size": _local_cache.max_size,
+        "shared_enabled": settings.EMBEDDING_CACHE_SHARED,
+    }
+
+
+#################################################################################################
+#   Document (ingestion) embeddings, cached by exact content
+#   Sentences embedded by the chunker and chunk texts embedded by the uploader share this cache,
+#   so a text that was already embedded (a one-sentence chunk, a retried page) costs nothing.
+#   Unlike queries, the text is not normalized: the key is the hash of the exact text.
+#   input: list of strings, output: float32 array of shape (len(texts), dimensions)
+#################################################################################################
+def get_document_embeddings(texts, model: str = EMBEDDING_MODEL):
+    model = f"{model}@{settings.EMBEDDING_DIMENSIONS}"
+    keys = [hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest() for text in texts]
+
+    found = {}
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key in found or key in missing:
+            continue
+        data = _document_cache.get(key)
+        if data is None:
+            missing[key] = text
+        else:
+            found[key] = data
+
+    if missing:
+        embeddings = create_embeddings(list(missing.values()))
+        for key, embedding in zip(missing, embeddings):
+            data = vector_to_bytes(embedding)
+            _document_cache.set(key, data)
+            found[key] = data
+
+    if not keys:
+        return np.zeros((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+    return np.stack([np.frombuffer(found[key], dtype="<f4") for key in keys])
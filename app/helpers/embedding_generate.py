@@ -1,11 +1,87 @@
 
-from app.core.openai import openaiClient
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.openai import openaiClient, openaiAsyncClient
+from app.helpers.tokens import count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_MODEL_DIMENSIONS = 3072
+
+
+def embedding_request_options():
+    # Only ask for shortened vectors when configured, the full size is the model default
+    if settings.EMBEDDING_DIMENSIONS < EMBEDDING_MODEL_DIMENSIONS:
+        return {"dimensions": settings.EMBEDDING_DIMENSIONS}
+    return {}
+
 #################################################################################################
 #   Helper function to get the vector embedding for any text
 #   input: string, output: multidimensional array representing embedding
-#   vector dimension size = 3072
+#   vector dimension size = settings.EMBEDDING_DIMENSIONS (3072 by default)
 #################################################################################################
 def create_embedding(txt):
-    embedding_model = "text-embedding-3-large"
-    str_embedding = openaiClient.embeddings.create(input= txt, model=embedding_model)
-    return str_embedding.data[0].embedding
\ No newline at end of file
+    str_embedding = openaiClient.embeddings.create(input= txt, model=EMBEDDING_MODEL, **embedding_request_options())
+    return str_embedding.data[0].embedding
+
+#################################################################################################
+#   Async version of create_embedding for the request path
+#################################################################################################
+async def create_embedding_async(txt):
+    str_embedding = await openaiAsyncClient.embeddings.create(input= txt, model=EMBEDDING_MODEL, **embedding_request_options())
+    return str_embedding.data[0].embedding
+
+#################################################################################################
+#   Helper function to split texts into embeddings requests
+#   A batch is closed when it reaches EMBEDDING_BATCH_SIZE inputs or EMBEDDING_BATCH_MAX_TOKENS
+#   tokens (counted with the chat tokenizer, the limit leaves headroom for the difference)
+#   input: list of strings, output: list of lists of strings
+#################################################################################################
+def make_embedding_batches(texts):
+    batches, batch, batch_tokens = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if batch and (len(batch) >= settings.EMBEDDING_BATCH_SIZE or batch_tokens + tokens > settings.EMBEDDING_BATCH_MAX_TOKENS):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+#################################################################################################
+#   Helper function to embed many texts with one embeddings request
+#   input: list of strings, output: list of embeddings in the same order
+#################################################################################################
+def create_embedding_batch(texts):
+    response = openaiClient.embeddings.create(input=texts, model=EMBEDDING_MODEL, **embedding_request_options())
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+#################################################################################################
+#   Helper function to embed any number of texts for ingestion
+#   Batches are sent concurrently, at most INGEST_MAX_IN_FLIGHT requests at a time
+#   input: list of strings, output: list of embeddings in the same order
+#################################################################################################
+def create_embeddings(texts):
+    batches = make_embedding_batches(texts)
+    if len(batches) <= 1:
+        return create_embedding_batch(batches[0]) if batches else []
+
+    with ThreadPoolExecutor(max_workers=settings.INGEST_MAX_IN_FLIGHT) as executor:
+        results = executor.map(create_embedding_batch, batches)
+        return [embedding for batch_embeddings in results for embedding in batch_embeddings]
+
+#################################################################################################
+#   Helper function to shorten an existing text-embedding-3 vector (Matryoshka truncation)
+#   input: embedding, target size, output: first `dimensions` values, L2 normalized again
+#   Equivalent to requesting `dimensions` from the API, so stored vectors need no re-embedding
+#################################################################################################
+def truncate_embedding(embedding, dimensions: int):
+    vector = np.asarray(embedding, dtype=np.float32)[:dimensions]
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector = vector / norm
+    return vector.tolist()
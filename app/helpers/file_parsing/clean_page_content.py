@@ -1,19 +1,170 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from app.core.config import settings
 from app.core.openai import openaiClient
+from app.helpers.tokens import count_tokens, get_encoding
 
 
 # TODO: Research the prompt, temperature, max_token
 
+#################################################################################################
+#   LLM cleaning of one page (OCR errors, formatting)
+#   input: page text, output: cleaned text (the original text if the call fails or was cut off)
+#   max_tokens follows the page length so long pages are not silently truncated
+#################################################################################################
 def clean_page_content(page_content):
     try:
         response = openaiClient.chat.completions.create(
-            model="gpt-4o-mini",  
+            model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an AI assistant that cleans and improves text extracted from PDFs. Your task is to correct any OCR errors, improve formatting, and ensure the text is clear and readable. Add no additional token"},
                 {"role": "user", "content": f"Please clean and improve the following text extracted from a PDF:\n\n{page_content}"}
             ],
-            max_tokens=3000
+            max_tokens=min(int(count_tokens(page_content) * 1.3) + 200, 16000)
         )
+        if response.choices[0].finish_reason == "length":
+            print("Page cleaning was cut off, keeping the page text")
+            return page_content
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Error cleaning page content: {e}")
-        return page_content  
\ No newline at end of file
+        return page_content
+
+
+#################################################################################################
+#   Local text quality scoring
+#   garbage_ratio:        share of characters that are neither letters, digits, combining marks
+#                         (Bangla vowel signs, virama), dandas, zero-width joiners, whitespace nor
+#                         common punctuation, plus "(cid:N)" glyphs of fonts without unicode map
+#   broken_hyphen_ratio:  share of lines ending in a word split by a hyphen
+#   dictionary_hit_rate:  share of latin words (3+ letters) that are a single token of the
+#                         o200k vocabulary, i.e. real words; OCR noise splits into many tokens.
+#                         None when the page has too few latin words to judge (e.g. Bangla text)
+#################################################################################################
+ALLOWED_SYMBOLS = set(".,;:!?'\"()[]{}%&/\\-–—+=*@#$৳€£¥<>|_~•●▪·’‘“”…°§©®™") | {"\u0964", "\u0965", "\u200c", "\u200d"}
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+BROKEN_HYPHEN_PATTERN = re.compile(r"(\w)-\n(\w)")
+LATIN_WORD_PATTERN = re.compile(r"\b[A-Za-z]{3,}\b")
+MIN_WORDS_FOR_DICTIONARY = 20
+
+
+def score_page_text(text: str) -> dict:
+    lines = [line for line in text.splitlines() if line.strip()]
+    cid_glyphs = CID_PATTERN.findall(text)
+    text_without_cid = CID_PATTERN.sub("", text)
+    visible = [char for char in text_without_cid if not char.isspace()]
+    # letters, numbers and marks (L*, N*, M*) are text in any script
+    garbage = sum(1 for char in visible if unicodedata.category(char)[0] not in "LNM" and char not in ALLOWED_SYMBOLS)
+    garbage_ratio = (garbage + len(cid_glyphs) * 4) / max(len(visible) + len(cid_glyphs) * 4, 1)
+
+    broken_hyphens = len(BROKEN_HYPHEN_PATTERN.findall(text))
+
+    words = LATIN_WORD_PATTERN.findall(text)
+    dictionary_hit_rate = None
+    if len(words) >= MIN_WORDS_FOR_DICTIONARY:
+        encoding = get_encoding()
+        hits = sum(1 for word in words if len(encoding.encode(" " + word.lower())) == 1)
+        dictionary_hit_rate = hits / len(words)
+
+    return {
+        "garbage_ratio": round(garbage_ratio, 3),
+        "broken_hyphen_ratio": round(broken_hyphens / max(len(lines), 1), 3),
+        "dictionary_hit_rate": round(dictionary_hit_rate, 3) if dictionary_hit_rate is not None else None,
+    }
+
+
+def needs_llm_cleaning(scores: dict) -> bool:
+    if scores["garbage_ratio"] > settings.CLEANING_MAX_GARBAGE_RATIO:
+        return True
+    if scores["dictionary_hit_rate"] is not None and scores["dictionary_hit_rate"] < settings.CLEANING_MIN_DICTIONARY_HIT_RATE:
+        return True
+    # most lines cut mid-word: the layout (columns, tables) came out scrambled
+    return scores["broken_hyphen_ratio"] > settings.CLEANING_MAX_BROKEN_HYPHEN_RATIO
+
+
+#################################################################################################
+#   Repeated header / footer detection across the pages of one document
+#   The first and last BOILERPLATE_EDGE_LINES lines of every page are counted (digits masked, so
+#   "Page 3" and "Page 4" are the same line); a line seen on BOILERPLATE_MIN_PAGES pages is
+#   boilerplate from then on. Pages are cleaned concurrently, so the first pages of a document
+#   may keep their header.
+#################################################################################################
+BOILERPLATE_EDGE_LINES = 2
+BOILERPLATE_MIN_PAGES = 3
+PAGE_NUMBER_PATTERN = re.compile(r"^\W*(page\s*)?\d+(\s*(of|/)\s*\d+)?\W*$", re.IGNORECASE)
+
+
+def _boilerplate_key(line: str) -> str:
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+class BoilerplateTracker:
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, lines):
+        edges = set(lines[:BOILERPLATE_EDGE_LINES] + lines[-BOILERPLATE_EDGE_LINES:])
+        with self._lock:
+            for line in edges:
+                self._counts[_boilerplate_key(line)] += 1
+
+    def is_boilerplate(self, line: str) -> bool:
+        with self._lock:
+            return self._counts[_boilerplate_key(line)] >= BOILERPLATE_MIN_PAGES
+
+
+#################################################################################################
+#   Deterministic normalization (no LLM)
+#   unicode NFKC (ligatures, full-width forms), soft hyphens, words split over lines joined,
+#   page numbers and repeated headers / footers removed, wrapped lines joined into paragraphs,
+#   whitespace collapsed
+#################################################################################################
+def normalize_page_text(text: str, boilerplate: BoilerplateTracker = None) -> str:
+    text = unicodedata.normalize("NFKC", text).replace("\u00ad", "")
+    text = BROKEN_HYPHEN_PATTERN.sub(r"\1\2", text)
+
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if boilerplate is not None:
+        boilerplate.observe(lines)
+
+    kept = []
+    for index, line in enumerate(lines):
+        at_edge = index < BOILERPLATE_EDGE_LINES or index >= len(lines) - BOILERPLATE_EDGE_LINES
+        if at_edge and (PAGE_NUMBER_PATTERN.match(line) or (boilerplate is not None and boilerplate.is_boilerplate(line))):
+            continue
+        kept.append(line)
+
+    paragraphs = []
+    for line in kept:
+        # a wrapped line continues the previous one when that did not end a sentence and this
+        # one starts in lower case
+        if paragraphs and not paragraphs[-1].endswith((".", ":", "?", "!", "]")) and line[:1].islower():
+            paragraphs[-1] += " " + line
+        else:
+            paragraphs.append(line)
+    return "\n".join(paragraphs)
+
+
+#################################################################################################
+#   Helper function to clean one page: normalization always, the LLM only for noisy pages
+#   input: page text, document boilerplate tracker, output: (cleaned text, decision dict)
+#   CLEANING_MODE "auto" (scored), "llm" (every page, the old behaviour) or "heuristic" (never)
+#################################################################################################
+def clean_page(page_content: str, boilerplate: BoilerplateTracker = None):
+    scores = score_page_text(page_content)
+    normalized = normalize_page_text(page_content, boilerplate)
+
+    if settings.CLEANING_MODE == "llm":
+        use_llm = True
+    elif settings.CLEANING_MODE == "heuristic":
+        use_llm = False
+    else:
+        use_llm = needs_llm_cleaning(scores)
+
+    cleaned = clean_page_content(normalized) if use_llm else normalized
+    return cleaned, {"decision": "llm" if use_llm else "heuristic", **scores}
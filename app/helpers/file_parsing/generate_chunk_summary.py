@@ -1,23 +1,114 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
 from app.core.openai import openaiClient
+from app.helpers.tokens import count_tokens
+
+SUMMARY_MODEL = "gpt-4o-mini"
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a helpful assistant. You receive numbered content chunks as a JSON array of "
+    '{"id": number, "content": string}. Summarize every chunk within 1 sentence. Answer with '
+    'a JSON object {"summaries": [{"id": number, "summary": string}]} that contains exactly '
+    "one entry for every id you received."
+)
 
 #################################################################################################
-#   Helper function to generate the summary for a chunk. The summary is then prepended
-#   input: semantic chunks, output: array of strings
+#   Helper function to summarize ONE chunk (one chat completion)
+#   input: chunk text, output: string
 #################################################################################################
-def generate_summary(semantic_chunks):  
-    summaries = []  # New list to store summaries
-    for semantic_chunk in semantic_chunks:   
-        prompt = f"Content: {semantic_chunk.page_content}"
-        prompt += "\nPlease provide a brief summary about this content within 1 sentence."
+def summarize_chunk(content: str) -> str:
+    prompt = f"Content: {content}"
+    prompt += "\nPlease provide a brief summary about this content within 1 sentence."
 
-        response = openaiClient.chat.completions.create(
-        model="gpt-4o-mini",
+    response = openaiClient.chat.completions.create(
+        model=SUMMARY_MODEL,
         messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
         ],
+    )
+    return response.choices[0].message.content
+
+#################################################################################################
+#   Helper function to summarize several chunks with ONE json-mode chat completion
+#   Chunks are sent with their position as id and the answer is mapped back by id, never by
+#   order. Ids missing from the answer are summarized one by one.
+#   input: list of (position, text), output: {position: summary}
+#################################################################################################
+def summarize_chunk_batch(batch):
+    try:
+        response = openaiClient.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps([{"id": position, "content": content} for position, content in batch])}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0,
         )
-        raw_response = response.choices[0].message.content
-        summaries.append(raw_response)  
-    
-    return summaries  
\ No newline at end of file
+        answer = json.loads(response.choices[0].message.content)
+        summaries = {
+            int(item["id"]): str(item["summary"]).strip()
+            for item in answer.get("summaries", [])
+            if isinstance(item, dict) and "id" in item and "summary" in item
+        }
+    except Exception as e:
+        print(f"Batched summarization failed, summarizing one by one: {e}")
+        summaries = {}
+
+    expected = {position for position, _ in batch}
+    for position, content in batch:
+        if position not in summaries or not summaries[position]:
+            summaries[position] = summarize_chunk(content)
+    return {position: summary for position, summary in summaries.items() if position in expected}
+
+#################################################################################################
+#   Helper function to group chunks into summarization batches
+#   A batch is closed at SUMMARY_BATCH_SIZE chunks or SUMMARY_BATCH_MAX_TOKENS input tokens.
+#   input: list of (position, text), output: list of lists of (position, text)
+#################################################################################################
+def make_summary_batches(indexed_contents):
+    batches, batch, batch_tokens = [], [], 0
+    for position, content in indexed_contents:
+        tokens = count_tokens(content)
+        if batch and (len(batch) >= settings.SUMMARY_BATCH_SIZE or batch_tokens + tokens > settings.SUMMARY_BATCH_MAX_TOKENS):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append((position, content))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+#################################################################################################
+#   Helper function to generate the summary for a chunk. The summary is then prepended
+#   input: semantic chunks, output: array of strings (same length and order as the chunks)
+#   SUMMARY_MODE "batched": many chunks per json-mode call, batches run concurrently
+#   SUMMARY_MODE "concurrent": one call per chunk, SUMMARY_CONCURRENCY calls at a time
+#   Chunks shorter than SUMMARY_MIN_CHARS are not summarized (empty summary), the summary would
+#   be as long as the chunk itself.
+#################################################################################################
+def generate_summary(semantic_chunks):
+    summaries = [""] * len(semantic_chunks)
+    to_summarize = [
+        (position, semantic_chunk.page_content)
+        for position, semantic_chunk in enumerate(semantic_chunks)
+        if len(semantic_chunk.page_content.strip()) >= settings.SUMMARY_MIN_CHARS
+    ]
+    if not to_summarize:
+        return summaries
+
+    with ThreadPoolExecutor(max_workers=settings.SUMMARY_CONCURRENCY) as executor:
+        if settings.SUMMARY_MODE == "batched":
+            for batch_summaries in executor.map(summarize_chunk_batch, make_summary_batches(to_summarize)):
+                for position, summary in batch_summaries.items():
+                    summaries[position] = summary
+        else:
+            positions = [position for position, _ in to_summarize]
+            contents = [content for _, content in to_summarize]
+            for position, summary in zip(positions, executor.map(summarize_chunk, contents)):
+                summaries[position] = summary
+
+    return summaries
@@ -1,8 +1,22 @@
 import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image as PILImage
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
 from app.core.openai import openaiClient
+from app.db.models.image_descriptions import ImageDescription
+from app.db.session import SessionLocal
 
 # TODO: Maybe USE STRUCTURED LLM HERE
 
+IMAGE_DESCRIPTION_FAILED = "[Image description generation failed]"
+
 
 def generate_image_description(base64_image):
     try:
@@ -24,4 +38,116 @@ def generate_image_description(base64_image):
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Error generating image description: {e}")
-        return "[Image description generation failed]"
\ No newline at end of file
+        return IMAGE_DESCRIPTION_FAILED
+
+
+#################################################################################################
+#   Image description cache
+#   Bank PDFs repeat the same logo / banner / seal on every page. Every image is decoded once:
+#   - decorative images (tiny, or thin rules and borders) are dropped before any API call
+#   - exact hash: sha256 of the decoded pixels (re-encoded copies of the same pixels match)
+#   - perceptual hash: 64-bit difference hash (rescaled or slightly recompressed copies match
+#     within IMAGE_PHASH_MAX_DISTANCE bits)
+#   Lookups go to an in-process LRU first (exact hash, or Hamming matching over the recent images
+#   of the same document), then to the image_descriptions table shared by all workers. The table
+#   only matches the exact hash: a perceptual match across documents can be a different chart or
+#   table with the same layout, and would get its description.
+#################################################################################################
+RECENT_IMAGES_SIZE = 1024
+
+_recent_images = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def difference_hash(image) -> int:
+    pixels = np.asarray(image.convert("L").resize((9, 8), PILImage.Resampling.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def is_decorative(width: int, height: int) -> bool:
+    if min(width, height) < settings.IMAGE_MIN_SIDE_PX or width * height < settings.IMAGE_MIN_AREA_PX:
+        return True
+    return max(width, height) / max(min(width, height), 1) > settings.IMAGE_MAX_ASPECT_RATIO
+
+
+def _recent_lookup(image_hash: str, perceptual_hash: int, document_id: str):
+    with _recent_lock:
+        if image_hash in _recent_images:
+            _recent_images.move_to_end(image_hash)
+            return _recent_images[image_hash][2]
+        for other_document_id, other_perceptual_hash, description in _recent_images.values():
+            if other_document_id != document_id:
+                continue
+            if bin(other_perceptual_hash ^ perceptual_hash).count("1") <= settings.IMAGE_PHASH_MAX_DISTANCE:
+                return description
+    return None
+
+
+def _recent_store(image_hash: str, perceptual_hash: int, document_id: str, description: str):
+    with _recent_lock:
+        _recent_images[image_hash] = (document_id, perceptual_hash, description)
+        _recent_images.move_to_end(image_hash)
+        while len(_recent_images) > RECENT_IMAGES_SIZE:
+            _recent_images.popitem(last=False)
+
+
+def _shared_lookup(image_hash: str):
+    with SessionLocal() as db:
+        return db.query(ImageDescription.description).filter(ImageDescription.image_hash == image_hash).scalar()
+
+
+def _shared_store(image_hash: str, perceptual_hash: str, width: int, height: int, description: str):
+    with SessionLocal() as db:
+        db.execute(
+            insert(ImageDescription)
+            .values(image_hash=image_hash, perceptual_hash=perceptual_hash, width=width, height=height, description=description)
+            .on_conflict_do_nothing(index_elements=[ImageDescription.image_hash])
+        )
+        db.commit()
+
+
+#################################################################################################
+#   Helper function to describe an extracted image, through the cache
+#   input: base64 encoded image, id of the document it comes from (scope of perceptual matching),
+#   output: description, or None for decorative / unreadable images
+#   A failing cache only costs a vision call, never the page.
+#################################################################################################
+def describe_image(base64_image, document_id: str = None):
+    try:
+        image = PILImage.open(io.BytesIO(base64.b64decode(base64_image)))
+        image.load()
+    except Exception as e:
+        print(f"Unable to decode image, skipping it: {e}")
+        return None
+
+    width, height = image.size
+    if is_decorative(width, height):
+        return None
+
+    image_hash = hashlib.sha256(f"{image.mode}:{width}x{height}:".encode("utf-8") + image.tobytes()).hexdigest()
+    perceptual_hash = difference_hash(image)
+    perceptual_hash_hex = f"{perceptual_hash:016x}"
+
+    description = _recent_lookup(image_hash, perceptual_hash, document_id)
+    if description is not None:
+        return description
+
+    try:
+        description = _shared_lookup(image_hash)
+    except Exception as e:
+        print(f"Image description cache lookup failed: {e}")
+    if description is not None:
+        _recent_store(image_hash, perceptual_hash, document_id, description)
+        return description
+
+    description = generate_image_description(base64_image)
+    if description == IMAGE_DESCRIPTION_FAILED:
+        return description
+
+    _recent_store(image_hash, perceptual_hash, document_id, description)
+    try:
+        _shared_store(image_hash, perceptual_hash_hex, width, height, description)
+    except Exception as e:
+        print(f"Image description cache write failed: {e}")
+    return description
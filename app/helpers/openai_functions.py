@@ -1,36 +1,95 @@
-from app.core.openai import openaiClient
+from app.core.openai import openaiClient, openaiAsyncClient
 from app.helpers.qdrant_functions import search_in_qdrant
 from fastapi import  HTTPException
 from app.core.config import settings
 
-def create_chat_completion(query, search_results):
+def build_chat_completion_messages(query, search_results):
     
     prompt = f"Chat History: {query}\n\n Knowledge Base: {search_results}\n"
     
+    return [
+        {
+            "role": "system", 
+            "content": 
+            f"""
+            You are a agent who helps people get banking information.
+            You represent the bank {settings.BANK_NAME} in Bangladesh
+            Your name is 'BankGPT'. You were created by 'BUET Incubator'.
+            You will be given an entire conversation and a knowledge base.
+            Try to answer all questions accordingly. Try to give them tips if necessary.
+            Always answer in human readable markdown format.
+            """
+            },
+        {"role": "user", "content": prompt}
+    ]
+
+def create_chat_completion(query, search_results):
+    
     try:
         response = openaiClient.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": 
-                    f"""
-                    You are a agent who helps people get banking information.
-                    You represent the bank {settings.BANK_NAME} in Bangladesh
-                    Your name is 'BankGPT'. You were created by 'BUET Incubator'.
-                    You will be given an entire conversation and a knowledge base.
-                    Try to answer all questions accordingly. Try to give them tips if necessary.
-                    Always answer in human readable markdown format.
-                    """
-                    },
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_chat_completion_messages(query, search_results),
+            temperature=0.5,
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+
+#################################################################################################
+#   Same as create_chat_completion but yields the answer piece by piece as the model
+#   produces it. input: conversation and knowledge, output: generator of text deltas
+#################################################################################################
+def create_chat_completion_stream(query, search_results):
+    
+    try:
+        stream = openaiClient.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_chat_completion_messages(query, search_results),
+            temperature=0.5,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+
+#################################################################################################
+#   Async versions of create_chat_completion / create_chat_completion_stream for the request path
+#################################################################################################
+async def create_chat_completion_async(query, search_results):
+    
+    try:
+        response = await openaiAsyncClient.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_chat_completion_messages(query, search_results),
             temperature=0.5,
         )
         return response.choices[0].message.content
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
 
+async def create_chat_completion_stream_async(query, search_results):
+    
+    try:
+        stream = await openaiAsyncClient.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=build_chat_completion_messages(query, search_results),
+            temperature=0.5,
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating chat completion: {str(e)}")
+
 def create_chat_completion_context(query, message_list, search_results):
     
     prompt = f"Query: {query}\n Knowledge Base: {search_results}\n"
@@ -1,37 +1,146 @@
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from fastapi import HTTPException
 from qdrant_client import models
 
 from app.schemas.files import File
 
-from app.core.qdrant import qdrantClient
+from app.core.config import settings
+from app.core.qdrant import qdrantClient, qdrantAsyncClient
 from app.helpers.embedding_generate import create_embedding
-from qdrant_client.http.models import VectorParams, Distance
+from app.helpers.embedding_cache import get_query_embedding_async, get_document_embeddings
+from app.helpers.sparse_vectors import SPARSE_VECTOR_NAME, create_document_sparse_vector, create_query_sparse_vector
+from qdrant_client.http.models import VectorParams, Distance, SparseVectorParams, Modifier
+
+# collection name -> whether it was created with the sparse BM25 vector
+_sparse_support = {}
+# collections whose payload indexes were already ensured by this process
+_indexed_collections = set()
+
+# payload keys used in filters (file deletes, inventory, page lookups); page_no is stored as a string
+PAYLOAD_INDEX_FIELDS = {
+    "file_id": models.PayloadSchemaType.KEYWORD,
+    "file_name": models.PayloadSchemaType.KEYWORD,
+    "page_no": models.PayloadSchemaType.KEYWORD,
+    "page_hash": models.PayloadSchemaType.KEYWORD,
+}
+INVENTORY_PAGE_SIZE = 1000
+# namespace of the content-addressed knowledge point ids
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "bankgpt/knowledge-point")
+
+
+# search results ranked by reciprocal rank fusion: the scores are rank sums, not similarities
+class FusedPoints(list):
+    pass
+
+#################################################################################################
+#   Helper functions to build the dense vector / quantization settings of a collection
+#   With quantization the original float32 vectors move to disk and only the quantized copy
+#   stays in RAM; searches oversample the quantized index and rescore with the originals.
+#################################################################################################
+def build_quantization_config(quantization: str):
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def build_vectors_config(dimensions: int, quantization: str):
+    return {
+        "content": VectorParams(
+            size=dimensions,
+            distance=Distance.COSINE,
+            on_disk=quantization in ("scalar", "binary")
+        ),
+    }
+
+def build_search_params(quantization: str = None):
+    quantization = settings.QDRANT_QUANTIZATION if quantization is None else quantization
+    if quantization not in ("scalar", "binary"):
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            rescore=True,
+            oversampling=settings.QDRANT_OVERSAMPLING
+        )
+    )
 
 #################################################################################################
 #   Helper function to make a collection
-#   input: collection name, output: integer
+#   input: collection name (+ optional dimensions / quantization overrides), output: string
 #################################################################################################
-def make_collection(collection_name:str):
+def make_collection(collection_name:str, dimensions: int = None, quantization: str = None):
+    dimensions = settings.EMBEDDING_DIMENSIONS if dimensions is None else dimensions
+    quantization = settings.QDRANT_QUANTIZATION if quantization is None else quantization
     try:
         qdrantClient.get_collection(collection_name)
+        ensure_payload_indexes(collection_name)
         return "Collection Already exists"
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         if "Not found" in str(e):
             qdrantClient.create_collection(
                 collection_name,
-                vectors_config={
-                    "content": VectorParams(
-                        size=3072,
-                        distance=Distance.COSINE
-                    ),
+                vectors_config=build_vectors_config(dimensions, quantization),
+                sparse_vectors_config={
+                    SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF),
                 },
+                quantization_config=build_quantization_config(quantization),
             )
+            ensure_payload_indexes(collection_name)
             rt_str = "Collection named:" + collection_name + "has been successfully created"
             return rt_str
         else:
             raise HTTPException(status_code=500, detail="Error occurred making the collection")
 
 
+#################################################################################################
+#   Helper function to create the keyword payload indexes of a collection
+#   Without them every filter on file_id / file_name / page_no scans the whole collection.
+#   Creating an index that already exists is a no-op in qdrant, so older collections get their
+#   indexes the next time make_collection runs for them.
+#   input: collection name, output: nothing
+#################################################################################################
+def ensure_payload_indexes(collection_name:str):
+    if collection_name in _indexed_collections:
+        return
+    try:
+        for field_name, field_schema in PAYLOAD_INDEX_FIELDS.items():
+            qdrantClient.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True,
+            )
+        _indexed_collections.add(collection_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error occurred creating the payload indexes {str(e)}")
+
+
+#################################################################################################
+#   Helper functions to check whether a collection has the sparse BM25 vector
+#   Collections created before hybrid search have only the dense "content" vector
+#   input: collection name, output: bool
+#################################################################################################
+def collection_has_sparse_vectors(collection_name:str):
+    if collection_name not in _sparse_support:
+        info = qdrantClient.get_collection(collection_name)
+        _sparse_support[collection_name] = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+    return _sparse_support[collection_name]
+
+async def collection_has_sparse_vectors_async(collection_name:str):
+    if collection_name not in _sparse_support:
+        info = await qdrantAsyncClient.get_collection(collection_name)
+        _sparse_support[collection_name] = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+    return _sparse_support[collection_name]
+
+
 #################################################################################################
 #   Helper function to Return the number of vector points in a particular collection
 #   input: collection name, output: integer
@@ -41,41 +150,231 @@ def vector_point_count(collection_name:str):
     return point_count.count
 
 
+#################################################################################################
+#   Helper function to derive the id of a knowledge point
+#   The same chunk of the same page of the same file always gets the same id, so re-running an
+#   ingestion overwrites its own points and parallel ingestions never collide.
+#   input: file id, page number, position of the chunk on the page, chunk text, output: uuid string
+#################################################################################################
+def make_point_id(file_id: str, page_no: str, ordinal: int, content: str) -> str:
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{file_id}:{page_no}:{ordinal}:{content_hash}"))
+
+
+#################################################################################################
+#   Helper function to delete the points of a page that were not written by the latest ingestion
+#   (a re-run chunked the page differently); served by the file_id / page_no payload indexes
+#   input: collection, file id, page number, ids to keep, output: nothing
+#################################################################################################
+def delete_stale_page_points(collection_name:str, file_id: str, page_no: str, keep_ids):
+    qdrantClient.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[
+                    models.FieldCondition(key="file_id", match=models.MatchValue(value=file_id)),
+                    models.FieldCondition(key="page_no", match=models.MatchValue(value=page_no)),
+                ],
+                must_not=[models.HasIdCondition(has_id=list(keep_ids))],
+            )
+        ),
+    )
+
+
+#################################################################################################
+#   Helper function to upsert points in batches of QDRANT_UPSERT_BATCH_SIZE
+#   Up to INGEST_MAX_IN_FLIGHT batches are sent at once. With QDRANT_UPSERT_WAIT=false they are
+#   only queued by qdrant, but the last batch always waits: qdrant applies updates in order, so
+#   when it returns every point of the call is searchable.
+#   input: collection name, list of points, output: nothing
+#################################################################################################
+def upsert_points(collection_name:str, points):
+    batch_size = settings.QDRANT_UPSERT_BATCH_SIZE
+    batches = [points[start:start + batch_size] for start in range(0, len(points), batch_size)]
+    if not batches:
+        return
+
+    *queued, last = batches
+    if queued:
+        with ThreadPoolExecutor(max_workers=settings.INGEST_MAX_IN_FLIGHT) as executor:
+            futures = [
+                executor.submit(qdrantClient.upsert, collection_name, points=batch, wait=settings.QDRANT_UPSERT_WAIT)
+                for batch in queued
+            ]
+            for future in futures:
+                future.result()
+    qdrantClient.upsert(collection_name, points=last, wait=True)
+
+
 #################################################################################################
 #   Helper function to upload into qdrant cloud
-#   input: modular file, page_no, semantic chunks, summaries and output: nothing
+#   input: modular file, page_no, semantic chunks, summaries and output: ids of the page's points
+#   All chunks of the call are embedded with batched (and cached) requests and upserted in batches.
+#   Point ids come from make_point_id, so the call is idempotent.
+#   page_hash (hash of the partitioned page) lets later uploads of the same page reuse the points.
 #################################################################################################
-def upload_to_qdrant(file_id: str, file_url:str, file_name:str, page_no:str, semantic_chunks, summaries, collection_name:str):
-    index = vector_point_count(collection_name)
-    summary_index = 0
+def upload_to_qdrant(file_id: str, file_url:str, file_name:str, page_no:str, semantic_chunks, summaries, collection_name:str, page_hash: str = None):
+    if not semantic_chunks:
+        return []
+
+    with_sparse = collection_has_sparse_vectors(collection_name)
 
-    for semantic_chunk in semantic_chunks:
+    # short chunks come without a summary
+    strs_to_embed = [
+        summary + "\n" + semantic_chunk.page_content if summary else semantic_chunk.page_content
+        for summary, semantic_chunk in zip(summaries, semantic_chunks)
+    ]
+    if settings.CHUNK_VECTOR_MODE == "mean" and all(getattr(chunk, "vector", None) is not None for chunk in semantic_chunks):
+        # built by the chunker from the sentence vectors, no embedding call
+        content_embeddings = [np.asarray(chunk.vector, dtype=np.float32).tolist() for chunk in semantic_chunks]
+    else:
+        content_embeddings = get_document_embeddings(strs_to_embed).tolist()
+
+    points = []
+    for ordinal, (semantic_chunk, str_to_embed, content_embedding) in enumerate(zip(semantic_chunks, strs_to_embed, content_embeddings)):
         # Create payload from File object fields
         payload = {
             "file_id": file_id,
             "content": semantic_chunk.page_content,
             "file_url": file_url,
             "file_name": file_name,
-            "page_no": page_no
+            "page_no": page_no,
+            "chunk_no": ordinal,
         }
+        if page_hash:
+            payload["page_hash"] = page_hash
 
-        str_to_embed = summaries[summary_index] + "\n" + semantic_chunk.page_content
-        content_embedding = create_embedding(str_to_embed)
-
-        qdrantClient.upsert(
-            collection_name,
-            points=[
-                {
-                    "id": index,
-                    "vector": {
-                        "content": content_embedding
-                    },
-                    "payload": payload
-                }
-            ]
+        vector = {
+            "content": content_embedding
+        }
+        if with_sparse:
+            vector[SPARSE_VECTOR_NAME] = create_document_sparse_vector(str_to_embed)
+
+        points.append(
+            {
+                "id": make_point_id(file_id, page_no, ordinal, semantic_chunk.page_content),
+                "vector": vector,
+                "payload": payload
+            }
+        )
+
+    point_ids = [point["id"] for point in points]
+    upsert_points(collection_name, points)
+    delete_stale_page_points(collection_name, file_id, page_no, point_ids)
+    return point_ids
+
+#################################################################################################
+#   Helper function to read points WITH their vectors (used to copy points, not for search)
+#   input: collection, filter, output: list of records
+#################################################################################################
+def scroll_points_with_vectors(collection_name:str, scroll_filter):
+    offset = None
+    records = []
+    while True:
+        points, offset = qdrantClient.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=INVENTORY_PAGE_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        records.extend(points)
+        if offset is None:
+            break
+    return records
+
+
+#################################################################################################
+#   Helper function to find one point matching a filter (no vectors, indexed payload keys only)
+#   output: payload of the point, None when nothing matches
+#################################################################################################
+def find_first_point(collection_name:str, scroll_filter):
+    points, _ = qdrantClient.scroll(
+        collection_name=collection_name,
+        scroll_filter=scroll_filter,
+        limit=1,
+        with_payload=models.PayloadSelectorInclude(include=list(PAYLOAD_INDEX_FIELDS)),
+        with_vectors=False,
+    )
+    return points[0].payload if points else None
+
+
+def _copied_point(record, file_id: str, file_url: str, file_name: str, page_no: str, chunk_no: int):
+    payload = {
+        **record.payload,
+        "file_id": file_id,
+        "file_url": file_url,
+        "file_name": file_name,
+        "page_no": page_no,
+    }
+    point_id = make_point_id(file_id, page_no, chunk_no, payload["content"])
+    return {"id": point_id, "vector": record.vector, "payload": payload}
+
+
+#################################################################################################
+#   Helper function to copy existing points to another file (no parsing, no LLM, no embedding)
+#   Vectors (dense and sparse) are reused as they are; payload and ids are those the points
+#   would have got from upload_to_qdrant for the target file.
+#   input: collection, source records, target file, optional target page, output: ids of the copies
+#################################################################################################
+def copy_points(collection_name:str, records, file_id: str, file_url: str, file_name: str, page_no: str = None):
+    records = sorted(records, key=lambda record: (str(record.payload.get("page_no")), record.payload.get("chunk_no", 0)))
+    points = []
+    pages = {}
+    for ordinal, record in enumerate(records):
+        target_page_no = page_no if page_no is not None else str(record.payload.get("page_no"))
+        point = _copied_point(record, file_id, file_url, file_name, target_page_no, record.payload.get("chunk_no", ordinal))
+        points.append(point)
+        pages.setdefault(target_page_no, []).append(point["id"])
+
+    upsert_points(collection_name, points)
+    for target_page_no, point_ids in pages.items():
+        delete_stale_page_points(collection_name, file_id, target_page_no, point_ids)
+    return [point["id"] for point in points]
+
+
+#################################################################################################
+#   Helper function to copy every point of one file to another file, one scroll page at a time
+#   Only one batch of vectors is held at once; only the copied ids are kept per target page.
+#   Stale points of the target pages are removed after the last batch (a page may span two
+#   batches). between_batches is called after every batch and may raise to stop the copy.
+#   input: collection, source file, target file, optional callback, output: number of points copied
+#################################################################################################
+def copy_file_points(collection_name:str, source_file_id: str, file_id: str, file_url: str, file_name: str, between_batches=None) -> int:
+    offset = None
+    pages = {}
+    copied = 0
+    while True:
+        records, offset = qdrantClient.scroll(
+            collection_name=collection_name,
+            scroll_filter=models.Filter(
+                must=[models.FieldCondition(key="file_id", match=models.MatchValue(value=source_file_id))]
+            ),
+            limit=settings.QDRANT_UPSERT_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
         )
-        index += 1
-        summary_index += 1
+        points = []
+        for record in records:
+            target_page_no = str(record.payload.get("page_no"))
+            page_point_ids = pages.setdefault(target_page_no, [])
+            point = _copied_point(record, file_id, file_url, file_name, target_page_no, record.payload.get("chunk_no", len(page_point_ids)))
+            points.append(point)
+            page_point_ids.append(point["id"])
+        upsert_points(collection_name, points)
+        copied += len(points)
+        del records, points
+        if between_batches is not None:
+            between_batches()
+        if offset is None:
+            break
+
+    for target_page_no, point_ids in pages.items():
+        delete_stale_page_points(collection_name, file_id, target_page_no, point_ids)
+    return copied
+
 
 #################################################################################################
 #   Helper function to Get all the vector-point IDs for a particular UUID of a file
@@ -83,35 +382,68 @@ def upload_to_qdrant(file_id: str, file_url:str, file_name:str, page_no:str, sem
 #################################################################################################
 def get_points_by_uuid(collection_name:str, uuid:str):
     offset = None
-    all_points = []
-    
+    all_point_ids = []
+
     while True:
-        result = qdrantClient.scroll(
+        points, next_offset = qdrantClient.scroll(
             collection_name=collection_name,
             scroll_filter=models.Filter(
                 must=[
                     models.FieldCondition(key="file_id", match=models.MatchValue(value=uuid)),
                 ]
             ),
-            limit=10,  
+            limit=INVENTORY_PAGE_SIZE,
             with_payload=False,
             with_vectors=False,
             offset=offset
         )
-        
-        points, next_offset = result
-        all_points.extend(points)
-        
+        all_point_ids.extend(point.id for point in points)
+
         if next_offset is None:
             break
-        
+
         offset = next_offset
-    
-    all_point_ids = []
-    all_point_ids.extend([point.id for point in points])
+
     return all_point_ids
 
 
+#################################################################################################
+#   Helper function to build the payload filter of a point inventory
+#   input: optional file_id / file_name / page_no, output: qdrant filter or None
+#################################################################################################
+def build_inventory_filter(file_id: str = None, file_name: str = None, page_no: str = None):
+    conditions = [
+        models.FieldCondition(key=key, match=models.MatchValue(value=value))
+        for key, value in (("file_id", file_id), ("file_name", file_name), ("page_no", page_no))
+        if value is not None
+    ]
+    return models.Filter(must=conditions) if conditions else None
+
+
+#################################################################################################
+#   Async generator over the points of a collection, one page at a time
+#   Pages are fetched with large scroll requests and handed out as they arrive, so a caller can
+#   stream an inventory of any size without holding it in memory. Only the indexed keys of the
+#   payload are fetched, never the chunk text.
+#   input: collection, filter, page size, output: lists of {"id", "file_id", "file_name", "page_no"}
+#################################################################################################
+async def iterate_points_async(collection_name: str, scroll_filter=None, page_size: int = INVENTORY_PAGE_SIZE):
+    offset = None
+    while True:
+        points, offset = await qdrantAsyncClient.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=page_size,
+            offset=offset,
+            with_payload=models.PayloadSelectorInclude(include=list(PAYLOAD_INDEX_FIELDS)),
+            with_vectors=False,
+        )
+        if points:
+            yield [{"id": point.id, **(point.payload or {})} for point in points]
+        if offset is None:
+            break
+
+
 #################################################################################################
 #   Helper function to DELETE all the vector-point IDs for a particular UUID of a file
 #   input: UUID and output: array of points
@@ -148,6 +480,48 @@ def search_in_qdrant(collection_name, query, limit):
         results = qdrantClient.search(
                 collection_name = collection_name,
                 query_vector = ("content", embedding),
+                search_params=build_search_params(),
+                limit=limit,
+                with_payload=True,
+                with_vectors=False,
+            )
+
+        return results
+    
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error occurred while searching in vectorDB {str(e)}")
+
+#################################################################################################
+#   Async version of search_in_qdrant for the request path.
+#   The query embedding goes through the embedding cache. When the collection has the sparse
+#   BM25 vector, dense and sparse candidates are fused by qdrant with reciprocal rank fusion,
+#   which catches exact terms (product codes, fee names, circular numbers) dense search misses.
+#################################################################################################
+async def search_in_qdrant_async(collection_name, query, limit):
+    try:
+        embedding = await get_query_embedding_async(query)
+
+        if settings.HYBRID_SEARCH_ENABLED and await collection_has_sparse_vectors_async(collection_name):
+            prefetch_limit = limit * settings.HYBRID_PREFETCH_MULTIPLIER
+            response = await qdrantAsyncClient.query_points(
+                collection_name = collection_name,
+                prefetch=[
+                    models.Prefetch(query=embedding, using="content", limit=prefetch_limit, params=build_search_params()),
+                    models.Prefetch(query=create_query_sparse_vector(query), using=SPARSE_VECTOR_NAME, limit=prefetch_limit),
+                ],
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                limit=limit,
+                with_payload=True,
+                with_vectors=False,
+            )
+            return FusedPoints(response.points)
+
+        results = await qdrantAsyncClient.search(
+                collection_name = collection_name,
+                query_vector = ("content", embedding),
+                search_params=build_search_params(),
                 limit=limit,
                 with_payload=True,
                 with_vectors=False,
@@ -158,4 +532,4 @@ def search_in_qdrant(collection_name, query, limit):
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error occurred while searching in vectorDB {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error occurred while searching in vectorDB {str(e)}")
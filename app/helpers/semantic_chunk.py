@@ -1,7 +1,14 @@
+import re
+
+import numpy as np
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_openai.embeddings import OpenAIEmbeddings
 from fastapi import HTTPException
 
+from app.core.config import settings
+from app.core.openai import openaiHttpClient
+from app.helpers.embedding_cache import get_document_embeddings
+
 #################################################################################################
 #   Helper function to get the chunks for any text
 #   input: string, output: array of semantically similar chunks
@@ -9,7 +16,7 @@ from fastapi import HTTPException
 #################################################################################################
 def create_semantic_chunks_95(text_content):
     try:
-        semantic_chunker = SemanticChunker(OpenAIEmbeddings(model="text-embedding-3-large"), breakpoint_threshold_type="percentile")
+        semantic_chunker = SemanticChunker(OpenAIEmbeddings(model="text-embedding-3-large", http_client=openaiHttpClient), breakpoint_threshold_type="percentile")
         semantic_chunks = semantic_chunker.create_documents([text_content])
         return semantic_chunks
     except Exception as e:
@@ -25,7 +32,7 @@ def create_semantic_chunks_95(text_content):
 def create_semantic_chunks_70(text_content, breakpoint_threshold=70):
     try:
         semantic_chunker = SemanticChunker(
-            embeddings=OpenAIEmbeddings(model="text-embedding-3-large"),
+            embeddings=OpenAIEmbeddings(model="text-embedding-3-large", http_client=openaiHttpClient),
             breakpoint_threshold_type="percentile",
             breakpoint_threshold_amount=breakpoint_threshold
         )
@@ -44,7 +51,7 @@ def create_semantic_chunks_70(text_content, breakpoint_threshold=70):
 def create_semantic_chunks_80(text_content, breakpoint_threshold=80):
     try:
         semantic_chunker = SemanticChunker(
-            embeddings=OpenAIEmbeddings(model="text-embedding-3-large"),
+            embeddings=OpenAIEmbeddings(model="text-embedding-3-large", http_client=openaiHttpClient),
             breakpoint_threshold_type="percentile",
             breakpoint_threshold_amount=breakpoint_threshold
         )
@@ -52,3 +59,74 @@ def create_semantic_chunks_80(text_content, breakpoint_threshold=80):
         return semantic_chunks
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating embedding: {str(e)}")
+
+
+#################################################################################################
+#   Semantic chunking without langchain's per-call embedder
+#   Same method as SemanticChunker(breakpoint_threshold_type="percentile", buffer_size=1), but:
+#   - every sentence is embedded once through the shared, cached ingestion embedder
+#     (get_document_embeddings) instead of a new OpenAIEmbeddings per page
+#   - the sentence windows (previous + current + next sentence) are combined from the sentence
+#     vectors with numpy instead of being embedded again
+#   - every chunk carries the normalized mean of its sentence vectors (used when
+#     CHUNK_VECTOR_MODE="mean"; a one-sentence chunk gets exactly its sentence vector)
+#################################################################################################
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.?!])\s+")
+
+
+class SemanticChunk:
+    def __init__(self, page_content: str, vector):
+        self.page_content = page_content
+        self.vector = vector
+
+
+def split_sentences(text_content: str):
+    return [sentence for sentence in SENTENCE_SPLIT_PATTERN.split(text_content) if sentence.strip()]
+
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+#################################################################################################
+#   Helper function to find the breakpoints between sentences
+#   input: sentence vectors (n, d), percentile, output: indexes i where a chunk ends after
+#   sentence i
+#################################################################################################
+def find_breakpoints(sentence_vectors, breakpoint_threshold):
+    if len(sentence_vectors) < 2:
+        return np.array([], dtype=int)
+
+    vectors = _normalize_rows(sentence_vectors)
+    # window of one sentence on each side, as buffer_size=1
+    padded = np.pad(vectors, ((1, 1), (0, 0)))
+    windows = _normalize_rows(padded[:-2] + padded[1:-1] + padded[2:])
+
+    distances = 1.0 - np.einsum("ij,ij->i", windows[:-1], windows[1:])
+    threshold = np.percentile(distances, breakpoint_threshold)
+    return np.flatnonzero(distances > threshold)
+
+
+#################################################################################################
+#   Helper function to get the chunks for any text
+#   input: string, output: array of SemanticChunk (page_content + vector)
+#################################################################################################
+def create_semantic_chunks(text_content, breakpoint_threshold=None):
+    breakpoint_threshold = settings.CHUNK_BREAKPOINT_PERCENTILE if breakpoint_threshold is None else breakpoint_threshold
+    try:
+        sentences = split_sentences(text_content)
+        if not sentences:
+            return []
+
+        sentence_vectors = get_document_embeddings(sentences)
+        chunks = []
+        start = 0
+        for end in list(find_breakpoints(sentence_vectors, breakpoint_threshold) + 1) + [len(sentences)]:
+            vector = sentence_vectors[start:end].mean(axis=0)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+            chunks.append(SemanticChunk(" ".join(sentences[start:end]), vector))
+            start = end
+        return chunks
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating embedding: {str(e)}")
@@ -0,0 +1,93 @@
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+
+from qdrant_client import models
+
+#################################################################################################
+#   Locally computed BM25 sparse vectors
+#   Documents get the BM25 term-frequency part, queries get weight 1 per term. The IDF part is
+#   applied by qdrant itself (Modifier.IDF on the sparse vector), so nothing here needs corpus
+#   statistics and ingestion stays stateless.
+#################################################################################################
+
+SPARSE_VECTOR_NAME = "content_sparse"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Rough average chunk length in tokens, used for BM25 length normalization
+BM25_AVG_DOC_LENGTH = 200
+
+
+def _combining_marks() -> str:
+    # character class ranges of the combining marks (category M) of the basic multilingual plane
+    ranges, start = [], None
+    for code in range(0x10000 + 1):
+        is_mark = code < 0x10000 and unicodedata.category(chr(code))[0] == "M"
+        if is_mark and start is None:
+            start = code
+        elif not is_mark and start is not None:
+            ranges.append(f"\\u{start:04x}-\\u{code - 1:04x}")
+            start = None
+    return "".join(ranges)
+
+
+# Unicode letters and digits plus combining marks, so Bangla words are not split at vowel signs
+# and virama (re's \w does not cover marks)
+WORD_CHAR = rf"(?:[^\W_]|[{_combining_marks()}])"
+# Keeps codes like "brpd-12/2024" or "1.5" together; their parts are added separately too
+TOKEN_PATTERN = re.compile(rf"{WORD_CHAR}+(?:[-/.]{WORD_CHAR}+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is",
+    "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with",
+    "what", "which", "who", "how", "do", "does", "can", "i", "you", "we", "my", "your",
+}
+
+
+def tokenize(text: str):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-/.]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+def token_index(token: str) -> int:
+    # Stable across processes and python versions (unlike hash())
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _to_sparse_vector(weights: dict) -> models.SparseVector:
+    merged = {}
+    for token, weight in weights.items():
+        index = token_index(token)
+        merged[index] = merged.get(index, 0.0) + weight
+    indices = sorted(merged)
+    return models.SparseVector(indices=indices, values=[merged[index] for index in indices])
+
+
+#################################################################################################
+#   Helper function to build the sparse vector of a chunk for ingestion
+#   input: string, output: qdrant SparseVector
+#################################################################################################
+def create_document_sparse_vector(text: str) -> models.SparseVector:
+    counts = Counter(tokenize(text))
+    doc_length = sum(counts.values())
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / BM25_AVG_DOC_LENGTH)
+    return _to_sparse_vector({
+        token: tf * (BM25_K1 + 1) / (tf + norm)
+        for token, tf in counts.items()
+    })
+
+
+#################################################################################################
+#   Helper function to build the sparse vector of a search query
+#   input: string, output: qdrant SparseVector
+#################################################################################################
+def create_query_sparse_vector(text: str) -> models.SparseVector:
+    return _to_sparse_vector({token: 1.0 for token in set(tokenize(text))})
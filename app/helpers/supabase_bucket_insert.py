@@ -2,9 +2,11 @@ from fastapi import HTTPException
 from app.core.supabase import supabase
 from app.core.config import settings
 from datetime import datetime
+import requests
 
 bucket_name = settings.SUPABASE_BUCKET_NAME
-def upload_file_to_supabase(file: bytes, filename: str, user_id: str) -> str:
+# file: bytes or the path of a file on disk (streamed from disk by the storage client)
+def upload_file_to_supabase(file, filename: str, user_id: str) -> str:
     try:
         current_time = datetime.now().strftime("%Y%m%d%H%M%S")
         unique_filename = f"{user_id}_{current_time}_{filename}"
@@ -32,4 +34,15 @@ def delete_file_from_supabase(file_path: str) -> bool:
         return True
     except Exception as e:
         print(f"Error deleting file from Supabase: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def download_file_to_path(file_url: str, target_path: str):
+    # streamed to disk in chunks, the document is never held in memory as a whole
+    try:
+        with requests.get(file_url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(target_path, "wb") as target_file:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    target_file.write(chunk)
+    except Exception as e:
+        raise Exception(f"Error downloading file from Supabase: {str(e)}")
@@ -0,0 +1,29 @@
+from functools import lru_cache
+
+import tiktoken
+
+# gpt-4o / gpt-4o-mini tokenizer
+ENCODING_NAME = "o200k_base"
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+#################################################################################################
+#   Helper function to count the tokens of a text the way the chat models do
+#   input: string, output: integer
+#################################################################################################
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+#################################################################################################
+#   Helper function to cut a text down to at most max_tokens tokens
+#   input: string, token limit, output: string
+#################################################################################################
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = get_encoding().encode(text or "", disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return get_encoding().decode(tokens[:max_tokens])
@@ -1,7 +1,7 @@
 import uuid
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 class FileCreate(BaseModel):
     uploader_id: uuid.UUID
@@ -11,6 +11,7 @@ class FileCreate(BaseModel):
 class FileUpdate(BaseModel):
     file_name: Optional[str] = None
     status: Optional[str] = None
+    parse_stats: Optional[Dict[str, Any]] = None
 
 
 class File(BaseModel):
@@ -20,3 +21,5 @@ class File(BaseModel):
     file_url: str
     status: str
     uploaded_at: datetime
+    parse_stats: Optional[Dict[str, Any]] = None
+    content_hash: Optional[str] = None
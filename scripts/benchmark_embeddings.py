@@ -0,0 +1,145 @@
+#################################################################################################
+#   Benchmarks embedding size x quantization settings on a sample of a real collection
+#
+#       python -m scripts.benchmark_embeddings --source bank --sample 5000 --queries 200
+#       python -m scripts.benchmark_embeddings --source bank --query-file questions.txt \
+#           --dimensions 3072 1024 512 --quantization none scalar binary
+#
+#   Queries are held-out chunk vectors of the source collection, or the embedded lines of
+#   --query-file. Ground truth is exact cosine top-k over the full-size sample vectors.
+#   For every configuration the sample is loaded into a temporary collection and the script
+#   reports recall@k against that ground truth, the RAM per point and for the whole sample,
+#   and p50 / p95 search latency. Temporary collections are deleted unless --keep is given.
+#################################################################################################
+import argparse
+import time
+
+import numpy as np
+from qdrant_client import models
+
+from app.core.openai import openaiClient
+from app.core.qdrant import qdrantClient
+from app.helpers.embedding_generate import EMBEDDING_MODEL, truncate_embedding
+from app.helpers.qdrant_functions import make_collection, build_search_params
+
+BYTES_PER_DIMENSION = {"none": 4.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def load_vectors(source: str, count: int):
+    ids, vectors = [], []
+    offset = None
+    while len(ids) < count:
+        records, offset = qdrantClient.scroll(
+            collection_name=source,
+            limit=min(256, count - len(ids)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=["content"],
+        )
+        for record in records:
+            ids.append(record.id)
+            vectors.append(record.vector["content"])
+        if offset is None:
+            break
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def embed_queries(path: str, dimensions: int):
+    with open(path, encoding="utf-8") as query_file:
+        queries = [line.strip() for line in query_file if line.strip()]
+    vectors = []
+    for start in range(0, len(queries), 256):
+        response = openaiClient.embeddings.create(
+            input=queries[start:start + 256], model=EMBEDDING_MODEL, dimensions=dimensions
+        )
+        vectors.extend(item.embedding for item in response.data)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(doc_vectors, query_vectors, k: int):
+    docs = doc_vectors / np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    queries = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    scores = queries @ docs.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_configuration(source, ids, doc_vectors, query_vectors, truth, dimensions, quantization, k, keep):
+    collection = f"{source}_bench_{dimensions}_{quantization}"
+    qdrantClient.delete_collection(collection)
+    make_collection(collection, dimensions=dimensions, quantization=quantization)
+    try:
+        for start in range(0, len(ids), 256):
+            qdrantClient.upsert(
+                collection,
+                points=[
+                    models.PointStruct(id=index, vector={"content": truncate_embedding(vector, dimensions)})
+                    for index, vector in zip(range(start, start + 256), doc_vectors[start:start + 256])
+                ],
+                wait=True,
+            )
+
+        search_params = build_search_params(quantization)
+        recalls, latencies = [], []
+        for query_vector, expected in zip(query_vectors, truth):
+            started = time.perf_counter()
+            results = qdrantClient.search(
+                collection_name=collection,
+                query_vector=("content", truncate_embedding(query_vector, dimensions)),
+                search_params=search_params,
+                limit=k,
+                with_payload=False,
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            found = {point.id for point in results}
+            recalls.append(len(found & set(int(index) for index in expected)) / k)
+
+        bytes_per_point = dimensions * BYTES_PER_DIMENSION[quantization]
+        return {
+            "dimensions": dimensions,
+            "quantization": quantization,
+            "recall": float(np.mean(recalls)),
+            "ram_bytes_per_point": bytes_per_point,
+            "ram_mb_sample": bytes_per_point * len(ids) / 2**20,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        }
+    finally:
+        if not keep:
+            qdrantClient.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="recall@k vs memory vs latency for embedding configurations")
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--sample", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-file")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[3072, 1024, 512])
+    parser.add_argument("--quantization", nargs="+", choices=["none", "scalar", "binary"], default=["none", "scalar", "binary"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    if args.query_file:
+        ids, doc_vectors = load_vectors(args.source, args.sample)
+        query_vectors = embed_queries(args.query_file, doc_vectors.shape[1])
+    else:
+        ids, vectors = load_vectors(args.source, args.sample + args.queries)
+        ids, doc_vectors, query_vectors = ids[args.queries:], vectors[args.queries:], vectors[:args.queries]
+
+    truth = exact_top_k(doc_vectors, query_vectors, args.k)
+    print(f"{len(ids)} points, {len(query_vectors)} queries, full size {doc_vectors.shape[1]} dims\n")
+    print(f"{'dims':>6} {'quant':>7} {'recall@' + str(args.k):>10} {'B/point':>9} {'MB sample':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for dimensions in args.dimensions:
+        if dimensions > doc_vectors.shape[1]:
+            print(f"skipping {dimensions} dims, larger than the stored vectors")
+            continue
+        for quantization in args.quantization:
+            row = run_configuration(
+                args.source, ids, doc_vectors, query_vectors, truth, dimensions, quantization, args.k, args.keep
+            )
+            print(
+                f"{row['dimensions']:>6} {row['quantization']:>7} {row['recall']:>10.3f} "
+                f"{row['ram_bytes_per_point']:>9.0f} {row['ram_mb_sample']:>10.2f} "
+                f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}"
+            )
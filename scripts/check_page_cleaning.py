@@ -0,0 +1,72 @@
+#################################################################################################
+#   Checks the page quality scorer that decides which pages go to the LLM for cleaning
+#
+#       python -m scripts.check_page_cleaning
+#       python -m scripts.check_page_cleaning --pdf circular.pdf
+#
+#   Without --pdf the built-in sample pages are scored (clean English, clean Bangla, OCR noise)
+#   and the script exits with status 1 when a decision differs from the expected one. With
+#   --pdf the text layer of every page is scored and the decisions are printed.
+#   Nothing is sent to OpenAI.
+#################################################################################################
+import argparse
+
+import pdfplumber
+
+from app.helpers.file_parsing.clean_page_content import score_page_text, needs_llm_cleaning
+
+SAMPLE_PAGES = [
+    (
+        "english",
+        "BANGLADESH BANK\nDepartment of Offsite Supervision\n"
+        "All scheduled banks are hereby informed that the loan classification and provisioning "
+        "policy has been revised. Banks shall maintain the required provision against classified "
+        "loans and advances and report the position to this department within the stipulated "
+        "time. This circular shall come into force with immediate effect.",
+        False,
+    ),
+    (
+        "bangla",
+        "বাংলাদেশ ব্যাংক\nঅফ-সাইট সুপারভিশন বিভাগ\n"
+        "সকল তফসিলি ব্যাংকের প্রধান নির্বাহীগণকে জানানো যাচ্ছে যে, ঋণ শ্রেণীকরণ ও সঞ্চিতি "
+        "সংরক্ষণ নীতিমালা সংশোধন করা হয়েছে। শ্রেণীকৃত ঋণের বিপরীতে প্রয়োজনীয় সঞ্চিতি সংরক্ষণ "
+        "করতে হবে। এই নির্দেশনা অবিলম্বে কার্যকর হবে।",
+        False,
+    ),
+    (
+        "ocr noise",
+        "Th3 b@nk sh#ll ¤¤ m@int@in ∆∆ pr0v1s10n ■■■ (cid:12)(cid:13)(cid:14) ag@inst ¬¬ cl@ss1f1ed "
+        "l0@ns ░░ (cid:40)(cid:41) w1th1n ▒▒ st1pul@ted t1me ¦¦",
+        True,
+    ),
+]
+
+
+def print_scores(name: str, scores: dict, use_llm: bool):
+    print(
+        f"{name:>12}: garbage {scores['garbage_ratio']:.3f}, broken hyphens {scores['broken_hyphen_ratio']:.3f}, "
+        f"dictionary {scores['dictionary_hit_rate']}, -> {'llm' if use_llm else 'heuristic'}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page quality scores and cleaning decisions")
+    parser.add_argument("--pdf")
+    args = parser.parse_args()
+
+    if args.pdf:
+        with pdfplumber.open(args.pdf) as pdf:
+            for page_no, page in enumerate(pdf.pages, start=1):
+                scores = score_page_text(page.extract_text() or "")
+                print_scores(f"page {page_no}", scores, needs_llm_cleaning(scores))
+        raise SystemExit(0)
+
+    failures = 0
+    for name, text, expected in SAMPLE_PAGES:
+        scores = score_page_text(text)
+        use_llm = needs_llm_cleaning(scores)
+        print_scores(name, scores, use_llm)
+        if use_llm != expected:
+            failures += 1
+            print(f"{name:>12}: expected {'llm' if expected else 'heuristic'}")
+    raise SystemExit(1 if failures else 0)
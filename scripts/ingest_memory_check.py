@@ -0,0 +1,64 @@
+#################################################################################################
+#   Checks the memory ceiling of the ingestion pipeline on a real PDF
+#
+#       python -m scripts.ingest_memory_check --pdf circular.pdf --limit-mb 2000
+#       python -m scripts.ingest_memory_check --pdf circular.pdf --limit-mb 2000 --pages-per-range 4 --processes 2
+#
+#   Runs the partition stage (the memory hungry part: layout model, OCR, page images) over the
+#   whole document and hands the pages to the same bounded page loop as the worker
+#   (run_pages_bounded), every page held for --hold-seconds to simulate a slow LLM / upload stage.
+#   Reports the peak RSS of the process and its children and how often the soft limit made the
+#   loop drain; a --limit-mb a little above the usual peak exercises that branch.
+#   Nothing is sent to OpenAI or qdrant. Exits with status 1 when the ceiling was exceeded.
+#################################################################################################
+import argparse
+import threading
+import time
+
+from app.core.config import settings
+from app.background.memory_guard import MemoryGuard
+from app.background.pdf_partition import count_pdf_pages, partition_pdf_parallel, run_pages_bounded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory of page-window PDF partitioning")
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--limit-mb", type=int, default=settings.INGEST_MEMORY_LIMIT_MB)
+    parser.add_argument("--pages-per-range", type=int, default=settings.INGEST_PAGES_PER_RANGE)
+    parser.add_argument("--processes", type=int, default=settings.INGEST_PARTITION_PROCESSES)
+    parser.add_argument("--hold-seconds", type=float, default=0.0)
+    parser.add_argument("--page-concurrency", type=int, default=settings.INGEST_PAGE_CONCURRENCY)
+    args = parser.parse_args()
+
+    settings.INGEST_PAGES_PER_RANGE = args.pages_per_range
+    settings.INGEST_PARTITION_PROCESSES = args.processes
+
+    memory_guard = MemoryGuard(args.limit_mb)
+    total_pages = count_pdf_pages(args.pdf)
+    started = time.perf_counter()
+    pages = 0
+    pages_lock = threading.Lock()
+
+    def hold_page(page_no, parts, strategy):
+        global pages
+        time.sleep(args.hold_seconds)
+        with pages_lock:
+            pages += 1
+        print(f"page {page_no}/{total_pages}: {strategy}, {len(parts)} parts, rss {memory_guard.sample():.0f} MB")
+
+    try:
+        run_pages_bounded(
+            partition_pdf_parallel(args.pdf, total_pages, memory_guard),
+            hold_page,
+            memory_guard,
+            args.page_concurrency,
+        )
+    except MemoryError as e:
+        print(f"FAILED after {pages} pages: {e}")
+        raise SystemExit(1)
+
+    print(
+        f"\n{pages} pages in {time.perf_counter() - started:.1f}s, "
+        f"peak {memory_guard.peak_mb:.0f} MB (limit {args.limit_mb or 'none'}), "
+        f"{memory_guard.soft_limit_drains} soft limit drains"
+    )
@@ -0,0 +1,82 @@
+#################################################################################################
+#   Migrates a knowledge collection to another embedding size and/or quantization
+#
+#   copy into a new collection (dense vectors are shortened with Matryoshka truncation, so
+#   nothing is re-embedded; sparse vectors and payloads are copied as they are):
+#       python -m scripts.migrate_collection --source bank --target bank_1024 --dimensions 1024 --quantization scalar
+#
+#   only switch the quantization of an existing collection (same dimensions):
+#       python -m scripts.migrate_collection --source bank --quantization binary --in-place
+#
+#   Afterwards set COLLECTION_NAME_RISK_MANAGEMENT, EMBEDDING_DIMENSIONS and QDRANT_QUANTIZATION
+#   to the new values and restart the API and the workers.
+#################################################################################################
+import argparse
+
+from qdrant_client import models
+
+from app.core.qdrant import qdrantClient
+from app.helpers.answer_cache import invalidate_answer_cache
+from app.helpers.embedding_generate import truncate_embedding
+from app.helpers.qdrant_functions import make_collection, build_quantization_config
+
+
+def migrate_in_place(source: str, quantization: str):
+    qdrantClient.update_collection(
+        source,
+        vectors_config={"content": models.VectorParamsDiff(on_disk=quantization in ("scalar", "binary"))},
+        quantization_config=build_quantization_config(quantization) or models.Disabled.DISABLED,
+    )
+    invalidate_answer_cache(source)
+    print(f"Collection {source} now uses quantization={quantization}")
+
+
+def migrate_copy(source: str, target: str, dimensions: int, quantization: str, batch_size: int):
+    source_dimensions = qdrantClient.get_collection(source).config.params.vectors["content"].size
+    if dimensions > source_dimensions:
+        raise SystemExit(f"Cannot grow vectors from {source_dimensions} to {dimensions} dims without re-embedding")
+
+    print(make_collection(target, dimensions=dimensions, quantization=quantization))
+
+    offset = None
+    copied = 0
+    while True:
+        records, offset = qdrantClient.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points = []
+        for record in records:
+            vector = dict(record.vector)
+            vector["content"] = truncate_embedding(vector["content"], dimensions)
+            points.append(models.PointStruct(id=record.id, vector=vector, payload=record.payload))
+        if points:
+            qdrantClient.upsert(target, points=points, wait=True)
+            copied += len(points)
+            print(f"Copied {copied} points")
+        if offset is None:
+            break
+
+    invalidate_answer_cache(target)
+    print(f"Done: {copied} points copied from {source} ({source_dimensions} dims) to {target} ({dimensions} dims, quantization={quantization})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change the embedding size / quantization of a knowledge collection")
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--target")
+    parser.add_argument("--dimensions", type=int)
+    parser.add_argument("--quantization", choices=["none", "scalar", "binary"], default="none")
+    parser.add_argument("--in-place", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.in_place:
+        migrate_in_place(args.source, args.quantization)
+    else:
+        if not args.target or not args.dimensions:
+            parser.error("--target and --dimensions are required unless --in-place is given")
+        migrate_copy(args.source, args.target, args.dimensions, args.quantization, args.batch_size)